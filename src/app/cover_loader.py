@@ -0,0 +1,61 @@
+# app/cover_loader.py
+from concurrent.futures import ThreadPoolExecutor
+
+from . import thumbnails
+from .ui_dispatch import dispatcher
+
+
+class CoverLoader:
+    """Декодирует обложки в пуле потоков и отдаёт их потоку Tk через dispatcher.
+
+    request(owner, path, size, callback) ставит загрузку миниатюры (или другой
+    картинки, если передан loader, например thumbnails.load_banner_background); owner — тот,
+    кому она нужна (например, строка списка). Новый запрос того же owner или
+    cancel(owner) отменяет прежний: ещё не начатая загрузка снимается с пула,
+    результат уже начатой просто не доставляется. Одинаковые (path, size)
+    декодируются один раз. Колбэки вызываются в потоке Tk.
+    """
+
+    def __init__(self, widget, max_workers=4):
+        self.widget = widget
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="RaZ-covers")
+        self._jobs = {}        # (loader, path, size) -> [future, {owner: callback}]
+        self._owner_keys = {}  # owner -> (loader, path, size)
+
+    def request(self, owner, path, size, callback, loader=thumbnails.load_thumbnail):
+        self.cancel(owner)
+        key = (loader, path, tuple(size))
+        job = self._jobs.get(key)
+        if job is None:
+            future = self._executor.submit(loader, path, key[2])
+            job = self._jobs[key] = [future, {}]
+            future.add_done_callback(lambda f, key=key: dispatcher.post(self._deliver, key, f, key=(self, key)))
+        job[1][owner] = callback
+        self._owner_keys[owner] = key
+
+    def cancel(self, owner):
+        key = self._owner_keys.pop(owner, None)
+        job = self._jobs.get(key) if key else None
+        if job is None: return
+        job[1].pop(owner, None)
+        # Загрузку, которая больше никому не нужна и ещё не началась, снимаем с пула
+        if not job[1] and job[0].cancel():
+            del self._jobs[key]
+
+    def cancel_all(self):
+        for owner in list(self._owner_keys): self.cancel(owner)
+
+    def shutdown(self):
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _deliver(self, key, future):
+        if not self.widget.winfo_exists(): return
+        job = self._jobs.get(key)
+        if job is None or job[0] is not future: return
+        del self._jobs[key]
+        image = None if future.cancelled() or future.exception() else future.result()
+        for owner, callback in job[1].items():
+            self._owner_keys.pop(owner, None)
+            try: callback(image)
+            except Exception as e: print(f"Ошибка при показе обложки: {e}")
@@ -1,8 +1,15 @@
 import json
 import os
+import sqlite3
 import sys
 import time
 
+from .library_db import LibraryStore
+from .persistence import PersistenceWorker
+from .journal import EventJournal, replay
+from .metadata_cache import MetadataCache
+from .search_cache import SearchCache
+
 # ... (Код определения путей без изменений) ...
 def is_frozen():
     return getattr(sys, 'frozen', False)
@@ -29,55 +36,197 @@ def _get_data_path(filename):
 DATA_FILE = _get_data_path("raz_playlist_v2.json")
 CONFIG_FILE = _get_data_path("raz_config.json")
 FAVORITES_NAME = "❤️ Избранное"
+SYSTEM_PLAYLISTS = ("Все треки", "Загруженное", FAVORITES_NAME)
+LIBRARY_DB_FILE = _get_data_path("raz_library.db")
+JOURNAL_FILE = _get_data_path("raz_library.journal")
+METADATA_CACHE_FILE = _get_data_path("raz_metadata_cache.db")
+FOLDER_SNAPSHOT_FILE = _get_data_path("raz_folder_snapshot.json")
+SEARCH_CACHE_FILE = _get_data_path("raz_search_cache.json")
+DOWNLOAD_QUEUE_FILE = _get_data_path("raz_downloads.json")
+_library_store = None
+_metadata_cache = None
+_search_cache = None
+writer = PersistenceWorker()
+journal = EventJournal(JOURNAL_FILE)
 
 def load_config():
     # ... (Код без изменений) ...
     try:
         with open(CONFIG_FILE, 'r') as f: config = json.load(f)
         if 'download_covers' not in config: config['download_covers'] = True
+        if 'library_folders' not in config: config['library_folders'] = []
+        if 'image_cache_mb' not in config: config['image_cache_mb'] = 64
+        if 'search_cache_ttl_hours' not in config: config['search_cache_ttl_hours'] = 6
+        if 'search_cache_size' not in config: config['search_cache_size'] = 200
+        if 'download_concurrency' not in config: config['download_concurrency'] = 2
         return config
     except (FileNotFoundError, json.JSONDecodeError):
-        return {"theme": "Яндекс.Ночь", "volume": 1.0, "download_covers": True}
+        return {"theme": "Яндекс.Ночь", "volume": 1.0, "download_covers": True, "library_folders": [], "image_cache_mb": 64, "search_cache_ttl_hours": 6, "search_cache_size": 200, "download_concurrency": 2}
 
 
-def save_config(theme, volume, download_covers):
-    # ... (Код без изменений) ...
-    with open(CONFIG_FILE, 'w') as f: json.dump({"theme": theme, "volume": volume, "download_covers": download_covers}, f, indent=4)
+def _atomic_write(path, text, encoding='utf-8'):
+    """Пишет во временный файл и подменяет им исходный: при сбое остаётся старая версия целиком."""
+    data = text.encode(encoding)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+def _write_config(config):
+    return _atomic_write(CONFIG_FILE, json.dumps(config, indent=4))
+
+def save_config(theme, volume, download_covers, library_folders=(), image_cache_mb=64, search_cache_ttl_hours=6, search_cache_size=200, download_concurrency=2):
+    writer.submit("config", _write_config, {"theme": theme, "volume": volume, "download_covers": download_covers, "library_folders": list(library_folders), "image_cache_mb": image_cache_mb,
+                                            "search_cache_ttl_hours": search_cache_ttl_hours, "search_cache_size": search_cache_size, "download_concurrency": download_concurrency})
+
+def load_folder_snapshot():
+    """Снимок папок медиатеки с прошлого сканирования: {папка: [mtime_ns, inode, файлы, подпапки]}."""
+    try:
+        with open(FOLDER_SNAPSHOT_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
+def _write_folder_snapshot(snapshot):
+    return _atomic_write(FOLDER_SNAPSHOT_FILE, json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")))
+
+def save_folder_snapshot(snapshot):
+    writer.submit("folder_snapshot", _write_folder_snapshot, snapshot)
+
+
+def _load_legacy_json():
+    """Читает старый монолитный raz_playlist_v2.json (используется только для миграции)."""
+    try:
+        with open(DATA_FILE, 'r', encoding='utf-8') as f:
+            playlist_data = json.load(f)
+        if "Избранное" in playlist_data and FAVORITES_NAME not in playlist_data:
+            playlist_data[FAVORITES_NAME] = playlist_data.pop("Избранное")
+        return playlist_data
+    except (json.JSONDecodeError, TypeError, OSError) as e:
+        print(f"Не удалось прочитать старый файл медиатеки: {e}")
+        return None
+
+def _normalize_legacy(playlist_data):
+    """Превращает {плейлист: [копии треков]} в таблицу треков с id и списки id.
+
+    Если у трека есть расходящиеся копии, побеждает копия из первого по порядку
+    системного плейлиста (обычно "Все треки").
+    """
+    names = [n for n in SYSTEM_PLAYLISTS if n in playlist_data] + [n for n in playlist_data if n not in SYSTEM_PLAYLISTS]
+    tracks, ids_by_path = {}, {}
+    for name in names:
+        for track in playlist_data[name]:
+            path = track.get('path')
+            if path and path not in ids_by_path:
+                ids_by_path[path] = len(ids_by_path) + 1
+                tracks[ids_by_path[path]] = dict(track, id=ids_by_path[path])
+    playlists = {}
+    for name, track_list in playlist_data.items():
+        ids = []
+        for track in track_list:
+            track_id = ids_by_path.get(track.get('path'))
+            if track_id is not None and track_id not in ids: ids.append(track_id)
+        playlists[name] = ids
+    return tracks, playlists
+
+def _migrate_legacy_json(store):
+    """Однократно переносит raz_playlist_v2.json в SQLite и переименовывает исходный файл."""
+    playlist_data = _load_legacy_json()
+    if playlist_data is None: return
+    store.save(*_normalize_legacy(playlist_data))
+    try:
+        os.replace(DATA_FILE, DATA_FILE + ".migrated")
+    except OSError as e:
+        print(f"Не удалось переименовать старый файл медиатеки: {e}")
+    print(f"Медиатека перенесена из '{DATA_FILE}' в '{LIBRARY_DB_FILE}'.")
+
+def get_library_store():
+    global _library_store
+    if _library_store is None:
+        _library_store = LibraryStore(LIBRARY_DB_FILE)
+    return _library_store
+
+def get_metadata_cache():
+    global _metadata_cache
+    if _metadata_cache is None:
+        _metadata_cache = MetadataCache(METADATA_CACHE_FILE)
+    return _metadata_cache
+
+def _save_search_cache(path, text):
+    writer.submit("search_cache", _atomic_write, path, text)
+
+def save_download_queue(path, text):
+    writer.submit("downloads", _atomic_write, path, text)
+
+def get_search_cache():
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache(SEARCH_CACHE_FILE, save=_save_search_cache)
+    return _search_cache
 
 def load_playlist():
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                playlist_data = json.load(f)
-
-            if "Избранное" in playlist_data and FAVORITES_NAME not in playlist_data:
-                playlist_data[FAVORITES_NAME] = playlist_data.pop("Избранное")
-
-            for cat in ["Все треки", "Загруженное", FAVORITES_NAME]:
-                if cat not in playlist_data:
-                    playlist_data[cat] = []
-
-            for category in playlist_data:
-                for track in playlist_data[category]:
-                    track.setdefault('score', 0)
-                    track.setdefault('cover_path', None)
-                    track.setdefault('play_count', 0)
-                    track.setdefault('album', 'Неизвестный альбом')
-                    track.setdefault('artist', 'Неизвестный исполнитель')
-                    track.setdefault('duration', 0)
-                    track.setdefault('date_added', time.time()) 
-                    # --- НОВОЕ ПОЛЕ ---
-                    track.setdefault('volume_multiplier', 1.0)
-
-            return playlist_data
-        except (json.JSONDecodeError, TypeError):
-            pass
-
-    return {"Все треки": [], "Загруженное": [], FAVORITES_NAME: []}
-
-def save_playlist(playlist_data):
-    # ... (Код без изменений) ...
+    """Возвращает медиатеку как ({id: трек}, {имя плейлиста: [id, ...]})."""
     try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f: json.dump(playlist_data, f, indent=4, ensure_ascii=False)
-    except Exception as e: print(f"Ошибка сохранения плейлиста: {e}")
\ No newline at end of file
+        store = get_library_store()
+        if store.is_empty() and os.path.exists(DATA_FILE):
+            _migrate_legacy_json(store)
+        tracks, playlists = store.load()
+        replay(journal.read(), tracks)
+        if journal.needs_compaction():
+            writer.submit("journal", _write_journal)
+    except sqlite3.Error as e:
+        print(f"Ошибка чтения медиатеки: {e}")
+        tracks, playlists = {}, {}
+
+    for cat in SYSTEM_PLAYLISTS:
+        if cat not in playlists:
+            playlists[cat] = []
+
+    now = time.time()
+    defaults = {'score': 0, 'play_count': 0, 'album': 'Неизвестный альбом', 'artist': 'Неизвестный исполнитель', 'duration': 0, 'date_added': now, 'volume_multiplier': 1.0}
+    for track in tracks.values():
+        track.setdefault('cover_path', None)
+        # Отсутствующие в базе значения приходят как NULL
+        for key, default in defaults.items():
+            if track.get(key) is None: track[key] = default
+
+    return tracks, playlists
+
+def _write_playlist(tracks, playlists, journal_seq):
+    get_library_store().save(tracks, playlists)
+    # Снимок уже содержит всё, что было в журнале на момент его создания
+    journal.truncate_covered_by(journal_seq)
+
+def _write_journal():
+    written = journal.write_pending()
+    if journal.needs_compaction():
+        get_library_store().apply_updates(journal.read())
+        journal.truncate()
+    return written
+
+def save_playlist(library):
+    """Ставит в очередь полную синхронизацию медиатеки (нужна при изменении состава плейлистов).
+
+    Снимок берётся сразу, в вызывающем потоке: фоновая запись не читает
+    словари, которые в это время может менять интерфейс.
+    """
+    journal_seq = journal.recorded_seq()
+    tracks = {track_id: dict(track) for track_id, track in library.tracks.items()}
+    playlists = {name: list(ids) for name, ids in library.playlists.items()}
+    writer.submit("library", _write_playlist, tracks, playlists, journal_seq)
+
+def update_track(track_id, **fields):
+    """Записывает изменение полей одного трека (рейтинг, прослушивания, громкость...) в журнал.
+
+    На диск уходит одна короткая строка; в базу изменения попадают при сжатии
+    журнала или при следующей полной синхронизации.
+    """
+    journal.record(track_id, **fields)
+    writer.submit("journal", _write_journal)
+
+def flush_pending_writes():
+    """Дописывает всё, что ещё в очереди. Вызывается при закрытии программы."""
+    writer.stop()
+    return writer.stats()
@@ -0,0 +1,255 @@
+# app/downloads.py
+import json
+import os
+import threading
+import time
+
+import yt_dlp
+
+MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 5 # секунд; каждая следующая попытка ждёт вдвое дольше
+ACTIVE_STATES = ("queued", "downloading")
+# Что сохраняется в файл очереди; скорость и прочее мгновенное состояние туда не попадает
+PERSISTED_FIELDS = ('id', 'url', 'title', 'uploader', 'thumbnail', 'download_covers', 'status', 'attempts', 'error', 'file_path', 'cover_path', 'downloaded_bytes', 'total_bytes')
+
+
+class _Cancelled(yt_dlp.utils.DownloadCancelled):
+    pass
+
+
+class DownloadManager:
+    """Очередь скачиваний: не больше max_concurrent загрузок одновременно.
+
+    Очередь сохраняется на диск, поэтому незавершённые загрузки продолжаются
+    после перезапуска; yt-dlp докачивает оставшиеся .part-файлы. Упавшая
+    загрузка повторяется с растущей задержкой, до MAX_ATTEMPTS попыток.
+    Об изменениях сообщает on_change() (вызывается из любого потока), а
+    snapshot() и take_completed() интерфейс читает уже в своём потоке.
+    """
+
+    def __init__(self, queue_path, download_dir, ffmpeg_path, max_concurrent=2, save=None, on_change=None):
+        self.queue_path = queue_path
+        self.download_dir = download_dir
+        self.ffmpeg_path = ffmpeg_path
+        self.max_concurrent = max_concurrent
+        self._save = save # save(path, text) — отложенная запись на диск; по умолчанию пишет сразу
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._items = {}    # id -> элемент очереди (dict), в порядке добавления
+        self._cancel = {}   # id -> threading.Event активной загрузки
+        self._completed = []
+        self._next_id = 1
+        self._shutting_down = False
+        self._wakeup_timer = None # будит очередь, когда подходит время повторной попытки
+        self.version = 0    # растёт при любом изменении, интерфейс перерисовывает панель только тогда
+        self._load()
+
+    # --- Очередь на диске ---
+    def _load(self):
+        try:
+            with open(self.queue_path, 'r', encoding='utf-8') as f: items = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for item in items:
+            # Прерванная закрытием программы загрузка продолжается с того же места
+            if item.get('status') == "downloading": item['status'] = "queued"
+            item.update(speed=None, next_attempt=0)
+            self._items[item['id']] = item
+        self._next_id = max(self._items, default=0) + 1
+
+    def _persist(self):
+        with self._lock:
+            text = json.dumps([{key: item.get(key) for key in PERSISTED_FIELDS} for item in self._items.values()], ensure_ascii=False)
+        if self._save: self._save(self.queue_path, text)
+        else:
+            with open(self.queue_path, 'w', encoding='utf-8') as f: f.write(text)
+
+    def _changed(self):
+        # Вызывается под self._lock
+        self.version += 1
+        if self.on_change: self.on_change()
+
+    # --- Управление ---
+    def enqueue(self, track_data, download_covers):
+        with self._lock:
+            retry_id = None
+            for item in self._items.values():
+                if item['url'] != track_data.get('url'): continue
+                if item['status'] in ACTIVE_STATES: return item['id']
+                # Упавшая или отменённая загрузка того же трека перезапускается, а не дублируется в очереди
+                if item['status'] in ("failed", "cancelled"): retry_id = item['id']
+        if retry_id is not None:
+            self.retry(retry_id)
+            return retry_id
+        with self._lock:
+            item_id = self._next_id
+            self._next_id += 1
+            self._items[item_id] = {
+                'id': item_id, 'url': track_data.get('url'), 'title': track_data.get('title', 'Без названия'),
+                'uploader': track_data.get('uploader'), 'thumbnail': track_data.get('thumbnail'), 'download_covers': download_covers,
+                'status': "queued", 'attempts': 0, 'error': None, 'file_path': None, 'cover_path': None,
+                'downloaded_bytes': 0, 'total_bytes': None, 'speed': None, 'next_attempt': 0,
+            }
+            self._changed()
+        self._persist()
+        self.pump()
+        return item_id
+
+    def cancel(self, item_id):
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None or item['status'] not in ACTIVE_STATES: return
+            item['status'], item['speed'] = "cancelled", None
+            event = self._cancel.get(item_id)
+            if event: event.set() # поток загрузки прервётся на следующем вызове progress hook
+            self._changed()
+        self._persist()
+
+    def retry(self, item_id):
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None or item['status'] not in ("failed", "cancelled"): return
+            item.update(status="queued", attempts=0, error=None, next_attempt=0)
+            self._changed()
+        self._persist()
+        self.pump()
+
+    def clear_finished(self):
+        with self._lock:
+            self._items = {i: item for i, item in self._items.items() if item['status'] in ACTIVE_STATES}
+            self._changed()
+        self._persist()
+
+    def set_concurrency(self, max_concurrent):
+        self.max_concurrent = max(1, max_concurrent)
+        self.pump()
+
+    def shutdown(self):
+        """Прерывает активные загрузки; в файле очереди они остаются и продолжатся при следующем запуске."""
+        with self._lock:
+            for event in self._cancel.values(): event.set()
+            self._shutting_down = True
+        if self._wakeup_timer: self._wakeup_timer.cancel()
+
+    # --- Для интерфейса ---
+    def snapshot(self):
+        with self._lock:
+            return [dict(item) for item in self._items.values()]
+
+    def take_completed(self):
+        """Скачанные с прошлого вызова треки: [(путь к mp3, путь к обложке или None), ...]."""
+        with self._lock:
+            completed, self._completed = self._completed, []
+        return completed
+
+    @property
+    def active(self):
+        with self._lock:
+            return any(item['status'] in ACTIVE_STATES for item in self._items.values())
+
+    # --- Планирование ---
+    def pump(self):
+        """Запускает ожидающие загрузки, пока есть свободные слоты."""
+        now, next_wakeup = time.time(), None
+        with self._lock:
+            if self._shutting_down: return
+            running = len(self._cancel)
+            for item in self._items.values():
+                if running >= self.max_concurrent: break
+                if item['status'] != "queued": continue
+                # Только что отменённую и сразу повторённую загрузку запустит pump() из finally прежнего потока
+                if item['id'] in self._cancel: continue
+                if item['next_attempt'] > now:
+                    next_wakeup = min(next_wakeup or item['next_attempt'], item['next_attempt'])
+                    continue
+                item['status'] = "downloading"
+                self._cancel[item['id']] = threading.Event()
+                running += 1
+                self._changed()
+                threading.Thread(target=self._run, args=(item['id'],), name=f"RaZ-download-{item['id']}", daemon=True).start()
+        if next_wakeup:
+            if self._wakeup_timer: self._wakeup_timer.cancel()
+            self._wakeup_timer = threading.Timer(next_wakeup - now, self.pump)
+            self._wakeup_timer.daemon = True
+            self._wakeup_timer.start()
+
+    def _run(self, item_id):
+        with self._lock:
+            item = dict(self._items[item_id])
+            cancel_event = self._cancel[item_id]
+        try:
+            file_path, cover_path = self._download(item, cancel_event)
+            with self._lock:
+                self._items[item_id].update(status="done", file_path=file_path, cover_path=cover_path, speed=None, error=None)
+                self._completed.append((file_path, cover_path))
+        except Exception as e:
+            if cancel_event.is_set():
+                # Отмена пользователем — удаляем недокачанное; при закрытии программы .part остаётся для докачки
+                with self._lock: current = dict(self._items.get(item_id) or {})
+                if current.get('status') == "cancelled": self._remove_partial(current)
+                return
+            print(f"Ошибка скачивания: {e}")
+            with self._lock:
+                current = self._items.get(item_id)
+                if current is not None and current['status'] == "downloading":
+                    current['attempts'] += 1
+                    current['error'] = str(e)
+                    current['speed'] = None
+                    if current['attempts'] < MAX_ATTEMPTS:
+                        current['status'] = "queued"
+                        current['next_attempt'] = time.time() + RETRY_BASE_DELAY * 2 ** (current['attempts'] - 1)
+                    else:
+                        current['status'] = "failed"
+        finally:
+            with self._lock:
+                self._cancel.pop(item_id, None)
+                self._changed()
+            self._persist()
+            self.pump()
+
+    def _download(self, item, cancel_event):
+        os.makedirs(self.download_dir, exist_ok=True)
+        item_id = item['id']
+
+        def progress_hook(d):
+            if cancel_event.is_set(): raise _Cancelled()
+            if d.get('status') != "downloading": return
+            with self._lock:
+                current = self._items.get(item_id)
+                if current is None: return
+                current['downloaded_bytes'] = d.get('downloaded_bytes') or 0
+                current['total_bytes'] = d.get('total_bytes') or d.get('total_bytes_estimate')
+                current['speed'] = d.get('speed')
+                current['part_path'] = d.get('tmpfilename')
+                self._changed()
+
+        ydl_opts = {
+            'format': 'bestaudio/best', 'outtmpl': os.path.join(self.download_dir, '%(title)s.%(ext)s'),
+            'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'}],
+            'ffmpeg_location': self.ffmpeg_path if os.path.exists(self.ffmpeg_path) else "ffmpeg",
+            'quiet': True, 'nocheckcertificate': True, 'continuedl': True, 'socket_timeout': 30,
+            'progress_hooks': [progress_hook],
+        }
+        if item['download_covers']: ydl_opts['writethumbnail'] = True
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(item['url'], download=True)
+            base_path, _ = os.path.splitext(ydl.prepare_filename(info))
+        if cancel_event.is_set(): raise _Cancelled()
+        downloaded_file_path = base_path + ".mp3"
+        if not os.path.exists(downloaded_file_path):
+            raise FileNotFoundError(f"Файл не найден после конвертации: {downloaded_file_path}")
+        cover_path = None
+        if item['download_covers']:
+            for ext in ['.jpg', '.jpeg', '.png', '.webp']:
+                if os.path.exists(base_path + ext): cover_path = base_path + ext; break
+        return downloaded_file_path, cover_path
+
+    def _remove_partial(self, item):
+        """Отменённая загрузка не должна оставлять недокачанных файлов."""
+        path = item.get('part_path')
+        if not path or not os.path.exists(path): return
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Не удалось удалить недокачанный файл: {e}")
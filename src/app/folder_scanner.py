@@ -0,0 +1,149 @@
+# app/folder_scanner.py
+import os
+import threading
+
+from .importer import SUPPORTED_EXTENSIONS
+
+
+def path_key(path):
+    """Форма пути для сравнения: пути из диалога и drag-and-drop на Windows приходят с "/", а os.scandir даёт "\\"."""
+    return os.path.normcase(os.path.normpath(path))
+
+
+def _under(path, root):
+    return path_key(path).startswith(os.path.join(path_key(root), ""))
+
+
+def scan_tree(root, snapshot, cancel_event=None, skipped=None):
+    """Обходит папку через os.scandir и возвращает {путь к папке: запись снимка}.
+
+    Запись — [mtime_ns, inode, {имя файла: [размер, mtime_ns, inode]}, [подпапки]].
+    Если у папки не изменились mtime и inode, её содержимое берётся из прошлого
+    снимка без повторного чтения каталога: добавление, удаление и переименование
+    файла меняют mtime именно той папки, где это произошло. Правки внутри
+    файлов при этом не отслеживаются — за ними следит кеш метаданных.
+    Папки, которые не удалось прочитать, и ссылки на папки (по ним обход не
+    идёт) добавляются в список skipped, если он передан.
+    """
+    result = {}
+    stack = [root]
+    while stack:
+        if cancel_event is not None and cancel_event.is_set(): break
+        path = stack.pop()
+        try:
+            st = os.stat(path)
+        except OSError:
+            if skipped is not None: skipped.append(path)
+            continue
+        previous = snapshot.get(path)
+        if previous and previous[0] == st.st_mtime_ns and previous[1] == st.st_ino:
+            entry = previous
+        else:
+            files, subdirs = {}, []
+            try:
+                with os.scandir(path) as it:
+                    for item in it:
+                        try:
+                            if item.is_dir(follow_symlinks=False):
+                                subdirs.append(item.name)
+                            elif item.is_symlink() and item.is_dir():
+                                if skipped is not None: skipped.append(item.path)
+                            elif item.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                                item_st = item.stat()
+                                files[item.name] = [item_st.st_size, item_st.st_mtime_ns, item_st.st_ino]
+                        except OSError:
+                            continue
+            except OSError as e:
+                print(f"Не удалось прочитать папку '{path}': {e}")
+                if skipped is not None: skipped.append(path)
+                continue
+            entry = [st.st_mtime_ns, st.st_ino, files, sorted(subdirs)]
+        result[path] = entry
+        stack.extend(os.path.join(path, name) for name in reversed(entry[3]))
+    return result
+
+
+class FolderScanJob:
+    """Фоновое сканирование папок медиатеки и сверка с тем, что уже в ней есть.
+
+    По окончании заполняет added (новые файлы), removed (пропавшие пути) и
+    moved (пары старый путь → новый путь, найденные по inode и размеру, а при
+    их отсутствии — по имени файла и размеру). Недоступная папка (например,
+    отключённый сетевой диск), нечитаемая подпапка или ссылка на папку
+    пропускаются целиком: их треки не считаются удалёнными. Удалённым считается
+    только путь, которого действительно нет на диске.
+    """
+
+    def __init__(self, roots, known_paths, snapshot):
+        self.roots = list(roots)
+        self.known_paths = known_paths
+        self.snapshot = snapshot
+        self.new_snapshot = {}
+        self.added, self.removed, self.moved = [], [], []
+        self.dirs_scanned = 0
+        self.finished = False
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def start(self):
+        threading.Thread(target=self._run, name="RaZ-folder-scan", daemon=True).start()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def _run(self):
+        try:
+            self._scan()
+        except Exception as e:
+            print(f"Ошибка сканирования папок медиатеки: {e}")
+        finally:
+            self.finished = True
+
+    def _scan(self):
+        current = {}
+        scanned_roots, skipped = [], []
+        for root in map(os.path.normpath, self.roots):
+            if not os.path.isdir(root):
+                print(f"Папка медиатеки недоступна, пропускаем: {root}")
+                # Сохраняем её прошлый снимок, чтобы следующий проход снова был быстрым
+                self.new_snapshot.update((p, e) for p, e in self.snapshot.items() if _under(p, root) or p == root)
+                continue
+            tree = scan_tree(root, self.snapshot, self._cancel_event, skipped)
+            if self.cancelled: return
+            scanned_roots.append(root)
+            self.new_snapshot.update(tree)
+            for dir_path, (_, _, files, _) in tree.items():
+                for name, info in files.items():
+                    current[os.path.join(dir_path, name)] = info
+        self.dirs_scanned = len(self.new_snapshot)
+
+        old_info = {}
+        for dir_path, (_, _, files, _) in self.snapshot.items():
+            for name, info in files.items():
+                old_info[os.path.join(dir_path, name)] = info
+
+        # Известные пути сравниваются в нормализованной форме: "lib//sub/a.mp3" и "lib/sub/a.mp3" — один файл
+        known_keys = {path_key(p) for p in self.known_paths}
+        current_keys = {path_key(p) for p in current}
+        new_paths = [p for p in current if path_key(p) not in known_keys]
+        missing = [p for p in self.known_paths
+                   if path_key(p) not in current_keys and any(_under(p, r) for r in scanned_roots)
+                   and not any(_under(p, s) for s in skipped) and not os.path.exists(p)]
+
+        by_inode = {(current[p][2], current[p][0]): p for p in new_paths if current[p][2]}
+        by_name = {(os.path.basename(p), current[p][0]): p for p in new_paths}
+        claimed = set()
+        for old_path in missing:
+            info = old_info.get(old_path)
+            new_path = None
+            if info:
+                new_path = by_inode.get((info[2], info[0])) or by_name.get((os.path.basename(old_path), info[0]))
+            if new_path and new_path not in claimed:
+                claimed.add(new_path)
+                self.moved.append((old_path, new_path))
+            else:
+                self.removed.append(old_path)
+        self.added = sorted(p for p in new_paths if p not in claimed)
@@ -0,0 +1,71 @@
+# app/image_cache.py
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class ImageCache:
+    """Общий для всех видов LRU-кеш картинок с бюджетом памяти в байтах.
+
+    Ключ — (путь, размер, вариант), например (cover_path, (48, 48), "cover").
+    Значение может быть и None: так запоминается, что картинку получить не удалось.
+    При превышении бюджета вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # ключ -> (значение, байты)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=0):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None: self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            self._evict()
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def _evict(self):
+        # Последнюю добавленную запись не вытесняем, даже если она одна больше бюджета
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self.evictions += 1
+
+
+def image_nbytes(pil_image):
+    """Примерная цена картинки в памяти: RGBA-пиксели PIL плюс копия в PhotoImage у Tk."""
+    return pil_image.width * pil_image.height * 4 * 2 if pil_image is not None else 0
+
+
+image_cache = ImageCache()
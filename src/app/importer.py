@@ -0,0 +1,181 @@
+# app/importer.py
+import os
+import queue
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import mutagen
+
+from .metadata_cache import file_key
+
+SUPPORTED_EXTENSIONS = (".mp3", ".wav", ".ogg", ".flac")
+CACHE_BATCH_SIZE = 200
+
+
+def _wav_duration(path):
+    """Длительность WAV по заголовку (число кадров / частота), без чтения сэмплов."""
+    try:
+        with wave.open(path, 'rb') as w:
+            return w.getnframes() / float(w.getframerate())
+    except (wave.Error, EOFError, OSError, ZeroDivisionError):
+        return None
+
+
+def read_track_metadata(path):
+    """Читает теги, длительность и параметры кодека файла.
+
+    Длительность берётся из заголовков (mutagen, для WAV — модуль wave), файл
+    целиком не декодируется. Выполняется в дочерних процессах пула, поэтому
+    не должна трогать ни Tk, ни pygame.
+    """
+    metadata = {}
+    try:
+        audio = mutagen.File(path, easy=True)
+        if audio is not None:
+            info = audio.info
+            metadata['duration'] = info.length
+            if getattr(audio, 'mime', None): metadata['codec'] = audio.mime[0]
+            for key in ('bitrate', 'sample_rate', 'channels'):
+                if getattr(info, key, None): metadata[key] = getattr(info, key)
+            for key in ('title', 'artist', 'album'):
+                if audio.get(key): metadata[key] = audio[key][0]
+    except Exception:
+        pass
+    if 'duration' not in metadata and path.lower().endswith(".wav"):
+        duration = _wav_duration(path)
+        if duration is not None: metadata['duration'] = duration
+    return metadata
+
+
+def read_cached_metadata(path, cache):
+    """read_track_metadata с кешем по (путь, размер, mtime)."""
+    key = file_key(path)
+    if key is None: return {}
+    metadata = cache.get(path, *key)
+    if metadata is None:
+        metadata = read_track_metadata(path)
+        cache.put(path, *key, metadata)
+    return metadata
+
+
+def expand_paths(paths):
+    """Раскрывает папки в список поддерживаемых аудиофайлов, сохраняя порядок."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            yield path
+
+
+class ImportJob:
+    """Фоновый импорт файлов: обход папок и чтение тегов в пуле процессов.
+
+    Результаты (путь, метаданные) складываются в очередь, которую поток
+    интерфейса забирает пачками через take_results. Для путей, уже
+    известных медиатеке, теги не читаются — вместо метаданных приходит None.
+    Неизменённые с прошлого чтения файлы берутся из metadata_cache.
+    """
+    PROCESS_POOL_THRESHOLD = 32
+
+    def __init__(self, paths, known_paths=frozenset(), target_playlist=None, max_workers=None, metadata_cache=None):
+        self.paths = list(paths)
+        self.known_paths = known_paths
+        self.metadata_cache = metadata_cache
+        self._file_keys = {}
+        self._cache_batch = []
+        self.target_playlist = target_playlist
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.total = 0
+        self.processed = 0
+        self.added = 0
+        self.finished = False
+        self._results = queue.Queue()
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def start(self):
+        threading.Thread(target=self._run, name="RaZ-import", daemon=True).start()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def take_results(self, limit=200):
+        """Забирает до limit готовых результатов. Возвращает (результаты, импорт_завершён)."""
+        finished = self.finished
+        results = []
+        while len(results) < limit:
+            try: results.append(self._results.get_nowait())
+            except queue.Empty: break
+        self.processed += len(results)
+        return results, finished and self._results.empty()
+
+    def _run(self):
+        try:
+            files = list(dict.fromkeys(expand_paths(self.paths)))
+            self.total = len(files)
+            new_files = []
+            for path in files:
+                if path in self.known_paths: self._results.put((path, None))
+                else:
+                    metadata = self._cached(path)
+                    if metadata is not None: self._results.put((path, metadata))
+                    else: new_files.append(path)
+            if new_files and not self.cancelled:
+                self._read_all(new_files)
+        except Exception as e:
+            print(f"Ошибка фонового импорта: {e}")
+        finally:
+            self._flush_cache()
+            self.finished = True
+
+    def _cached(self, path):
+        if self.metadata_cache is None: return None
+        key = file_key(path)
+        if key is None: return None
+        self._file_keys[path] = key
+        return self.metadata_cache.get(path, *key)
+
+    def _remember(self, path, metadata):
+        key = self._file_keys.pop(path, None)
+        if self.metadata_cache is None or key is None: return
+        self._cache_batch.append((path, *key, metadata))
+        if len(self._cache_batch) >= CACHE_BATCH_SIZE: self._flush_cache()
+
+    def _flush_cache(self):
+        if not self._cache_batch: return
+        try:
+            self.metadata_cache.put_many(self._cache_batch)
+        except Exception as e:
+            print(f"Не удалось сохранить кеш метаданных: {e}")
+        self._cache_batch = []
+
+    def _read_all(self, files):
+        done = 0
+        if len(files) >= self.PROCESS_POOL_THRESHOLD:
+            try:
+                done = self._read_with(ProcessPoolExecutor(max_workers=self.max_workers), files, chunksize=16)
+            except (BrokenProcessPool, OSError) as e:
+                print(f"Пул процессов недоступен ({e}), читаем теги в потоках.")
+        if done < len(files) and not self.cancelled:
+            self._read_with(ThreadPoolExecutor(max_workers=self.max_workers), files[done:])
+
+    def _read_with(self, executor, files, chunksize=1):
+        done = 0
+        try:
+            for path, metadata in zip(files, executor.map(read_track_metadata, files, chunksize=chunksize)):
+                if self.cancelled: break
+                self._results.put((path, metadata))
+                self._remember(path, metadata)
+                done += 1
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return done
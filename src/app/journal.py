@@ -0,0 +1,88 @@
+# app/journal.py
+import json
+import os
+import threading
+
+
+class EventJournal:
+    """Журнал мелких изменений треков, дописываемый в конец файла.
+
+    Каждая строка — JSON вида {"id": 12, "play_count": 7}: абсолютные новые
+    значения полей, а не приращения. Поэтому повторное применение журнала
+    (например, после сбоя во время сжатия) ничего не портит.
+    """
+
+    def __init__(self, path, compact_threshold=256 * 1024):
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self._buffer = []
+        self._recorded_seq = 0
+        self._written_seq = 0
+        self._lock = threading.Lock()
+
+    def record(self, track_id, **fields):
+        """Запоминает событие в памяти; на диск его отправит write_pending."""
+        with self._lock:
+            self._buffer.append(dict(fields, id=track_id))
+            self._recorded_seq += 1
+
+    def recorded_seq(self):
+        """Номер последнего записанного в память события — отметка для снимка медиатеки."""
+        with self._lock:
+            return self._recorded_seq
+
+    def write_pending(self):
+        """Дописывает накопленные события одной операцией. Возвращает число байт."""
+        with self._lock:
+            events, self._buffer = self._buffer, []
+            self._written_seq = self._recorded_seq
+        if not events: return 0
+        data = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in events).encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(data)
+        return len(data)
+
+    def read(self):
+        """Возвращает события в порядке записи; оборванная последняя строка пропускается."""
+        events = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try: event = json.loads(line)
+                    except json.JSONDecodeError: continue
+                    if isinstance(event, dict) and "id" in event: events.append(event)
+        except FileNotFoundError:
+            pass
+        return events
+
+    def size(self):
+        try: return os.path.getsize(self.path)
+        except OSError: return 0
+
+    def needs_compaction(self):
+        return self.size() > self.compact_threshold
+
+    def truncate(self):
+        """Очищает файл журнала (после того как его содержимое попало в основное хранилище)."""
+        with open(self.path, "wb"):
+            pass
+
+    def truncate_covered_by(self, snapshot_seq):
+        """Очищает журнал после записи снимка, если в файле нет событий новее снимка.
+
+        Если такие события уже на диске, журнал остаётся как есть: повторное
+        применение старых абсолютных значений поверх снимка безопасно, потому что
+        за ними в файле идут более новые.
+        """
+        with self._lock:
+            if self._written_seq > snapshot_seq: return False
+        self.truncate()
+        return True
+
+
+def replay(events, tracks):
+    """Накладывает события журнала на загруженную таблицу треков."""
+    for event in events:
+        track = tracks.get(event["id"])
+        if track is not None:
+            track.update((k, v) for k, v in event.items() if k != "id")
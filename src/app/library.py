@@ -0,0 +1,137 @@
+# app/library.py
+
+
+class Library:
+    """Нормализованная медиатека в памяти.
+
+    tracks      — каноническая таблица {id: трек}, у каждого трека есть поле 'id';
+    playlists   — {имя плейлиста: [id, ...]} в порядке добавления;
+    ids_by_path — путь → id, memberships — id → множество плейлистов с этим треком.
+
+    Трек существует в одном экземпляре, сколько бы плейлистов на него ни ссылалось.
+
+    Подписчики (subscribe) получают события изменений:
+      ("insert", плейлист, id)         — трек добавлен в конец плейлиста;
+      ("remove", плейлист, позиции)    — удалены элементы с этими (старыми) позициями, по возрастанию;
+      ("update", id, {поле: значение}) — изменились поля трека;
+      ("delete", {id, ...})            — треки удалены из медиатеки (после событий "remove" по плейлистам);
+      ("drop", плейлист)               — плейлист удалён;
+      ("reload",)                      — медиатека загружена заново.
+    """
+
+    def __init__(self):
+        self.tracks = {}
+        self.playlists = {}
+        self.ids_by_path = {}
+        self.memberships = {}
+        self._next_id = 1
+        self._listeners = []
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners: self._listeners.remove(callback)
+
+    def _emit(self, *event):
+        for callback in list(self._listeners):
+            callback(event)
+
+    def load(self, tracks, playlists):
+        self.tracks = tracks
+        self.playlists = playlists
+        self.ids_by_path = {track['path']: track_id for track_id, track in tracks.items()}
+        self.memberships = {track_id: set() for track_id in tracks}
+        for name, ids in playlists.items():
+            for track_id in ids:
+                self.memberships.setdefault(track_id, set()).add(name)
+        self._next_id = max(tracks, default=0) + 1
+        self._emit("reload")
+
+    # --- Чтение ---
+    def get(self, track_id):
+        return self.tracks.get(track_id)
+
+    def get_by_path(self, path):
+        track_id = self.ids_by_path.get(path)
+        return None if track_id is None else self.tracks[track_id]
+
+    def track_at(self, playlist_name, index):
+        return self.tracks[self.playlists[playlist_name][index]]
+
+    def playlist_tracks(self, playlist_name):
+        return [self.tracks[track_id] for track_id in self.playlists.get(playlist_name, ())]
+
+    def contains(self, playlist_name, track_id):
+        return playlist_name in self.memberships.get(track_id, ())
+
+    def playlists_of(self, track_id):
+        return self.memberships.get(track_id, set())
+
+    # --- Изменение ---
+    def add_track(self, track):
+        """Добавляет трек в таблицу (если пути там ещё нет) и возвращает его id."""
+        track_id = self.ids_by_path.get(track['path'])
+        if track_id is not None: return track_id
+        track_id = self._next_id
+        self._next_id += 1
+        track['id'] = track_id
+        self.tracks[track_id] = track
+        self.ids_by_path[track['path']] = track_id
+        self.memberships[track_id] = set()
+        return track_id
+
+    def add_to_playlist(self, playlist_name, track_id):
+        """Добавляет трек в конец плейлиста. Возвращает False, если он уже там есть."""
+        if self.contains(playlist_name, track_id): return False
+        self.playlists.setdefault(playlist_name, []).append(track_id)
+        self.memberships.setdefault(track_id, set()).add(playlist_name)
+        self._emit("insert", playlist_name, track_id)
+        return True
+
+    def remove_from_playlist(self, playlist_name, track_ids):
+        track_ids = set(track_ids)
+        ids = self.playlists.get(playlist_name, [])
+        positions = [i for i, track_id in enumerate(ids) if track_id in track_ids]
+        if not positions: return
+        self.playlists[playlist_name] = [i for i in ids if i not in track_ids]
+        for track_id in track_ids:
+            self.memberships.get(track_id, set()).discard(playlist_name)
+        self._emit("remove", playlist_name, positions)
+
+    def update_track(self, track_id, **fields):
+        """Меняет поля трека и сообщает об этом подписчикам."""
+        track = self.tracks.get(track_id)
+        if track is None: return
+        track.update(fields)
+        self._emit("update", track_id, fields)
+
+    def remove_tracks(self, track_ids):
+        """Удаляет треки из медиатеки и из всех плейлистов."""
+        track_ids = set(track_ids)
+        affected = set().union(*(self.playlists_of(i) for i in track_ids))
+        for name in affected:
+            self.remove_from_playlist(name, track_ids)
+        for track_id in track_ids:
+            track = self.tracks.pop(track_id, None)
+            self.memberships.pop(track_id, None)
+            if track: self.ids_by_path.pop(track['path'], None)
+        self._emit("delete", track_ids)
+        return affected
+
+    def create_playlist(self, playlist_name):
+        self.playlists.setdefault(playlist_name, [])
+
+    def drop_playlist(self, playlist_name):
+        for track_id in self.playlists.pop(playlist_name, ()):
+            self.memberships.get(track_id, set()).discard(playlist_name)
+        self._emit("drop", playlist_name)
+
+    def rename_path(self, old_path, new_path):
+        """Переносит трек на новый путь (файл переместили или переименовали)."""
+        track_id = self.ids_by_path.pop(old_path, None)
+        if track_id is None: return None
+        self.tracks[track_id]['path'] = new_path
+        self.ids_by_path[new_path] = track_id
+        self._emit("update", track_id, {'path': new_path})
+        return track_id
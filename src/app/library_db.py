@@ -0,0 +1,125 @@
+# app/library_db.py
+import json
+import sqlite3
+import threading
+
+# Поля трека, которые хранятся в отдельных колонках. Всё остальное,
+# что могло оказаться в словаре трека, уходит в колонку extra (JSON).
+TRACK_COLUMNS = ("name", "artist", "album", "duration", "date_added", "score", "play_count", "cover_path", "volume_multiplier")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT,
+    artist TEXT,
+    album TEXT,
+    duration REAL,
+    date_added REAL,
+    score INTEGER,
+    play_count INTEGER,
+    cover_path TEXT,
+    volume_multiplier REAL,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+    track_id INTEGER NOT NULL REFERENCES tracks(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (playlist_id, track_id)
+);
+CREATE INDEX IF NOT EXISTS idx_playlist_tracks_order ON playlist_tracks(playlist_id, position);
+"""
+
+
+def _track_row(track):
+    """Раскладывает словарь трека на значения колонок таблицы tracks."""
+    extra = {k: v for k, v in track.items() if k not in TRACK_COLUMNS and k not in ("path", "id")}
+    return (track["path"],) + tuple(track.get(col) for col in TRACK_COLUMNS) + (json.dumps(extra, ensure_ascii=False) if extra else None,)
+
+
+class LibraryStore:
+    """Транзакционное SQLite-хранилище медиатеки: треки, плейлисты и их состав."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT NOT EXISTS (SELECT 1 FROM playlists)").fetchone()[0] == 1
+
+    def load(self):
+        """Возвращает ({id: трек}, {имя плейлиста: [id, ...]})."""
+        with self._lock:
+            tracks = {}
+            columns = ", ".join(TRACK_COLUMNS)
+            for row in self._conn.execute(f"SELECT id, path, {columns}, extra FROM tracks"):
+                track = dict(zip(TRACK_COLUMNS, row[2:-1]))
+                track["id"], track["path"] = row[0], row[1]
+                if row[-1]:
+                    try: track.update(json.loads(row[-1]))
+                    except json.JSONDecodeError: pass
+                tracks[row[0]] = track
+
+            playlists = {}
+            playlist_names = {}
+            for playlist_id, name in self._conn.execute("SELECT id, name FROM playlists ORDER BY position"):
+                playlists[name] = []
+                playlist_names[playlist_id] = name
+            for playlist_id, track_id in self._conn.execute("SELECT playlist_id, track_id FROM playlist_tracks ORDER BY playlist_id, position"):
+                if track_id in tracks:
+                    playlists[playlist_names[playlist_id]].append(track_id)
+            return tracks, playlists
+
+    def save(self, tracks, playlists):
+        """Полностью синхронизирует базу с медиатекой в одной транзакции. Id треков задаёт вызывающий."""
+        placeholders = ", ".join("?" for _ in TRACK_COLUMNS)
+        updates = ", ".join(f"{col}=excluded.{col}" for col in ("path",) + TRACK_COLUMNS + ("extra",))
+        with self._lock, self._conn:
+            stale = [(i,) for (i,) in self._conn.execute("SELECT id FROM tracks") if i not in tracks]
+            self._conn.executemany("DELETE FROM tracks WHERE id = ?", stale)
+            self._conn.executemany(
+                f"INSERT INTO tracks (id, path, {', '.join(TRACK_COLUMNS)}, extra) VALUES (?, ?, {placeholders}, ?) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                ((track_id,) + _track_row(track) for track_id, track in tracks.items()))
+
+            existing_playlists = dict(self._conn.execute("SELECT name, id FROM playlists"))
+            self._conn.executemany("DELETE FROM playlists WHERE name = ?", [(n,) for n in existing_playlists if n not in playlists])
+            self._conn.executemany(
+                "INSERT INTO playlists (name, position) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET position=excluded.position",
+                [(name, pos) for pos, name in enumerate(playlists)])
+            playlist_ids = dict(self._conn.execute("SELECT name, id FROM playlists"))
+
+            self._conn.execute("DELETE FROM playlist_tracks")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO playlist_tracks (playlist_id, track_id, position) VALUES (?, ?, ?)",
+                ((playlist_ids[name], track_id, pos) for name, ids in playlists.items() for pos, track_id in enumerate(ids) if track_id in tracks))
+
+    def update_track(self, track_id, **fields):
+        """Обновляет отдельные поля одного трека — одна строка, одна транзакция."""
+        self.apply_updates([dict(fields, id=track_id)])
+
+    def apply_updates(self, updates):
+        """Применяет пачку точечных изменений {"id": ..., поле: значение} в одной транзакции."""
+        with self._lock, self._conn:
+            for update in updates:
+                fields = {k: v for k, v in update.items() if k in TRACK_COLUMNS}
+                if not fields: continue
+                assignments = ", ".join(f"{col} = ?" for col in fields)
+                self._conn.execute(f"UPDATE tracks SET {assignments} WHERE id = ?", (*fields.values(), update["id"]))
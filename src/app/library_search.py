@@ -0,0 +1,125 @@
+# app/library_search.py
+import re
+
+SEARCH_FIELDS = ('name', 'artist', 'album')
+FIELD_WEIGHTS = (3, 2, 1) # совпадение в названии важнее, чем в исполнителе, а тот — чем в альбоме
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    return (text or "").casefold().replace("ё", "е")
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrackSearchIndex:
+    """Инвертированный индекс медиатеки для мгновенного фильтра по названию, исполнителю и альбому.
+
+    Слова из трёх и более букв ищутся как подстроки через триграммы (кандидаты —
+    пересечение списков триграмм, затем проверка подстрокой). Слова из одной-двух
+    букв — как начала слов. Индекс строится при первом запросе и дальше
+    поддерживается по событиям Library.
+    """
+
+    def __init__(self, library):
+        self.library = library
+        self._texts = {}    # id -> нормализованные (название, исполнитель, альбом)
+        self._words = {}    # id -> слова каждого из этих полей
+        self._trigrams = {} # триграмма -> множество id
+        self._prefixes = {} # первые 1-2 буквы слова -> множество id
+        self._built = False
+        library.subscribe(self._on_library_event)
+
+    # --- Поддержка индекса ---
+    def _build(self):
+        self._texts, self._words, self._trigrams, self._prefixes = {}, {}, {}, {}
+        for track_id, track in self.library.tracks.items():
+            self._add(track_id, track)
+        self._built = True
+
+    def _add(self, track_id, track):
+        texts = tuple(normalize(track.get(field)) for field in SEARCH_FIELDS)
+        words = tuple(tuple(_WORD_RE.findall(text)) for text in texts)
+        self._texts[track_id], self._words[track_id] = texts, words
+        grams, prefixes = set(), set()
+        for text, field_words in zip(texts, words):
+            grams |= _trigrams(text)
+            for word in field_words:
+                prefixes.add(word[:1]); prefixes.add(word[:2])
+        for gram in grams: self._trigrams.setdefault(gram, set()).add(track_id)
+        for prefix in prefixes: self._prefixes.setdefault(prefix, set()).add(track_id)
+
+    def _discard(self, track_id):
+        texts, words = self._texts.pop(track_id, None), self._words.pop(track_id, ())
+        if texts is None: return
+        for text, field_words in zip(texts, words):
+            for gram in _trigrams(text):
+                postings = self._trigrams.get(gram)
+                if postings is not None: postings.discard(track_id)
+            for word in field_words:
+                for prefix in (word[:1], word[:2]):
+                    postings = self._prefixes.get(prefix)
+                    if postings is not None: postings.discard(track_id)
+
+    def _on_library_event(self, event):
+        if not self._built: return
+        kind = event[0]
+        if kind == "reload": self._built = False
+        elif kind == "insert" and event[2] not in self._texts:
+            track = self.library.get(event[2])
+            if track: self._add(event[2], track)
+        elif kind == "update" and any(field in event[2] for field in SEARCH_FIELDS):
+            track = self.library.get(event[1])
+            self._discard(event[1])
+            if track: self._add(event[1], track)
+        elif kind == "delete":
+            for track_id in event[1]: self._discard(track_id)
+
+    # --- Поиск ---
+    def _candidates(self, word):
+        if len(word) < 3: return self._prefixes.get(word, set())
+        postings = sorted((self._trigrams.get(gram, set()) for gram in _trigrams(word)), key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def _score(self, query_words, texts, words):
+        total = 0
+        for word in query_words:
+            best = 0
+            for text, field_words, weight in zip(texts, words, FIELD_WEIGHTS):
+                if len(word) < 3:
+                    # Короткие слова ищутся только как начала слов
+                    if not any(w.startswith(word) for w in field_words): continue
+                    at_word_start = True
+                else:
+                    if word not in text: continue
+                    at_word_start = text.startswith(word) or f" {word}" in text
+                best = max(best, weight * 2 + (1 if at_word_start else 0))
+            if not best: return 0
+            total += best
+        return total
+
+    def search(self, query, ids=None):
+        """id треков, подходящих под запрос, по убыванию релевантности.
+
+        Если передан ids, результат ограничен этими треками, а при равной
+        релевантности сохраняется их порядок.
+        """
+        words = _WORD_RE.findall(normalize(query))
+        if not words: return list(self.library.tracks) if ids is None else list(ids)
+        if not self._built: self._build()
+        candidates = None
+        for word in sorted(set(words), key=len, reverse=True): # длинные слова отсекают больше
+            postings = self._candidates(word)
+            candidates = set(postings) if candidates is None else candidates & postings
+            if not candidates: return []
+        scores = {}
+        for track_id in candidates:
+            texts = self._texts.get(track_id)
+            if texts is None or track_id not in self.library.tracks: continue
+            score = self._score(words, texts, self._words[track_id])
+            if score: scores[track_id] = score
+        result = [track_id for track_id in (scores if ids is None else ids) if track_id in scores]
+        result.sort(key=lambda track_id: -scores[track_id])
+        return result
@@ -8,15 +8,22 @@ import random
 import time
 from functools import partial
 import threading
-import mutagen
+from bisect import bisect_left
 
-from . import data_manager, theme_manager, search
+from . import data_manager, theme_manager, search, importer
 from . import updater
 from .ui_components import GradientFrame, VolumeDialog, SelectPlaylistDialog
 from .ui_panels import SidebarFrame, ContentFrame, PlayerControlFrame
 from PIL import Image
 from .data_manager import FAVORITES_NAME
+from .library import Library
+from .sort_index import SortIndexes
+from .library_search import TrackSearchIndex
+from .folder_scanner import FolderScanJob
+from .image_cache import image_cache
 from .theme_editor import ThemeEditor
+from .downloads import DownloadManager
+from .ui_dispatch import dispatcher
 
 VERSION = "1.0.5" # Версия обновлена
 
@@ -27,7 +34,11 @@ class RaZPlayer(ctk.CTkFrame):
         config = data_manager.load_config()
         self.theme_name = config.get("theme", "Яндекс.Ночь")
         self.THEMES = theme_manager.THEMES
-        self.playlist_data = {}
+        self.library = Library()
+        self.library.subscribe(self._on_library_event)
+        self.sort_indexes = SortIndexes(self.library)
+        self.track_search = TrackSearchIndex(self.library)
+        self.playlist_data = self.library.playlists
         self.current_category = "Все треки"
         self.current_track_index = -1
         self.current_song_length = 0
@@ -41,12 +52,28 @@ class RaZPlayer(ctk.CTkFrame):
         self.pygame = pygame
         self.last_volume = float(config.get("volume", 1.0))
         self.download_covers_var = ctk.BooleanVar(value=config.get("download_covers", True))
+        self.library_folders = list(config.get("library_folders", []))
+        self.image_cache_mb = config.get("image_cache_mb", 64)
+        image_cache.set_budget(self.image_cache_mb * 1024 * 1024)
+        self.search_cache_ttl_hours = config.get("search_cache_ttl_hours", 6)
+        self.search_cache_size = config.get("search_cache_size", 200)
+        data_manager.get_search_cache().configure(self.search_cache_ttl_hours * 3600, self.search_cache_size)
+        self.download_concurrency = config.get("download_concurrency", 2)
+        # Прогресс загрузок приходит из их потоков; пока панель не перерисована, новые уведомления склеиваются в одно
+        self.download_manager = DownloadManager(data_manager.DOWNLOAD_QUEUE_FILE, search.DOWNLOAD_PATH, search.FFMPEG_PATH, self.download_concurrency, save=data_manager.save_download_queue,
+                                                on_change=lambda: dispatcher.post(self._on_downloads_changed, key="downloads"))
         
         self.search_results_cache = []
+        self.search_job = None
 
         self.view_cache = {}
         self.current_content_frame = None
+
+        self.import_job = None
+        self._import_queue = []
+        self.scan_job = None
         
+        data_manager.writer.start()
         pygame.mixer.init()
         ctk.set_appearance_mode("dark")
         
@@ -56,8 +83,13 @@ class RaZPlayer(ctk.CTkFrame):
         self.set_volume(self.last_volume * 100, True)
         self.sidebar.select_playlist_button("Все треки")
 
-        update_thread = threading.Thread(target=updater.check_for_updates, args=(VERSION,), daemon=True)
+        # Единственный путь из рабочих потоков в интерфейс — очередь dispatcher, разбираемая в потоке Tk
+        dispatcher.start(self)
+        update_thread = threading.Thread(target=updater.check_for_updates, args=(VERSION, dispatcher, self.on_closing), daemon=True)
         update_thread.start()
+        if self.library_folders: self.after(1000, self.rescan_library_folders)
+        # Незавершённые с прошлого запуска загрузки продолжаются
+        self.download_manager.pump()
 
     def init_ui(self):
         colors = self.THEMES[self.theme_name]
@@ -91,17 +123,41 @@ class RaZPlayer(ctk.CTkFrame):
         if self.current_content_frame and self.current_content_frame.winfo_exists():
             self.current_content_frame.refresh_current_view()
         
+    def _hide_current_frame(self):
+        frame = self.current_content_frame
+        if not frame or not frame.winfo_exists(): return
+        # Вид, выброшенный из кеша, больше не понадобится — его виджеты уничтожаем
+        if any(frame is cached for cached in self.view_cache.values()): frame.grid_remove()
+        else: frame.destroy()
+
+    def _drop_views(self, view_ids=None):
+        """Убирает виды из кеша; все, кроме показанного сейчас, сразу уничтожаются."""
+        for view_id in list(self.view_cache) if view_ids is None else view_ids:
+            frame = self.view_cache.pop(view_id, None)
+            if frame is not None and frame is not self.current_content_frame and frame.winfo_exists(): frame.destroy()
+
+    def _on_library_event(self, event):
+        if event[0] == "remove" and event[1] == self.current_category and self.current_track_index >= 0:
+            # Номер играющего трека — позиция в плейлисте, она сдвигается при удалении элементов перед ним
+            positions = event[2]
+            shift = bisect_left(positions, self.current_track_index)
+            if shift < len(positions) and positions[shift] == self.current_track_index: self.current_track_index = -1
+            else: self.current_track_index -= shift
+        for frame in list(self.view_cache.values()):
+            if frame.winfo_exists(): frame.on_library_event(event)
+
     def show_view(self, view_id):
         if view_id in self.view_cache:
-            if self.current_content_frame:
-                self.current_content_frame.grid_remove()
+            self._hide_current_frame()
             self.current_content_frame = self.view_cache[view_id]
             self.current_content_frame.grid(row=0, column=0, sticky="nsew")
-            # Обновление контента (списка треков) происходит внутри refresh_current_view
-            self.current_content_frame.refresh_current_view() 
+            # Кешированный вид уже в актуальном состоянии: его поддерживают события медиатеки
+            if self.current_content_frame.needs_refresh: self.current_content_frame.refresh_current_view()
+            elif view_id.startswith("playlist_"):
+                self.current_content_frame.update_active_track_highlight()
+                self.current_content_frame.update_import_progress(self.import_job)
         else:
-            if self.current_content_frame:
-                self.current_content_frame.grid_remove()
+            self._hide_current_frame()
                 
             new_frame = ContentFrame(self.content_container, controller=self)
             self.view_cache[view_id] = new_frame
@@ -111,7 +167,7 @@ class RaZPlayer(ctk.CTkFrame):
             if view_id.startswith("playlist_"):
                 category_name = view_id.replace("playlist_", "")
                 self.current_category = category_name
-                tracks = self.playlist_data.get(category_name, [])
+                tracks = self.library.playlist_tracks(category_name)
                 self.current_content_frame.display_playlist_view(category_name, tracks)
             elif view_id == "search":
                 self.current_content_frame.display_search_view()
@@ -129,87 +185,173 @@ class RaZPlayer(ctk.CTkFrame):
     def show_themes_view(self): self.show_view("themes")
 
     def load_playlist_data(self):
-        self.playlist_data = data_manager.load_playlist()
+        self.library.load(*data_manager.load_playlist())
+        self.playlist_data = self.library.playlists
         self.sidebar.update_playlist_list(list(self.playlist_data.keys()))
 
     def save_current_config(self):
-        data_manager.save_config(self.theme_name, self.last_volume, self.download_covers_var.get())
+        data_manager.save_config(self.theme_name, self.last_volume, self.download_covers_var.get(), self.library_folders, self.image_cache_mb, self.search_cache_ttl_hours, self.search_cache_size, self.download_concurrency)
 
     def on_closing(self):
+        if self.import_job: self.import_job.cancel()
+        if self.scan_job: self.scan_job.cancel()
+        if self.search_job: self.search_job.cancel()
+        self.download_manager.shutdown()
         self.save_current_config()
-        data_manager.save_playlist(self.playlist_data)
+        data_manager.save_playlist(self.library)
+        stats = data_manager.flush_pending_writes()
+        print(f"Запись на диск: запрошено {stats['requested']}, выполнено {stats['performed']}, "
+              f"{stats['bytes']} байт, средняя задержка {stats['avg_latency'] * 1000:.1f} мс, "
+              f"макс. время в потоке интерфейса {stats['max_submit_time'] * 1000:.2f} мс")
+        cache_stats = image_cache.stats()
+        print(f"Кеш картинок: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}, "
+              f"вытеснено {cache_stats['evictions']}, занято {cache_stats['bytes'] // 1024} из {cache_stats['max_bytes'] // 1024} КБ")
+        search_stats = data_manager.get_search_cache().stats()
+        print(f"Кеш поиска: записей {search_stats['entries']}, свежих попаданий {search_stats['hits']}, "
+              f"устаревших {search_stats['stale_hits']}, промахов {search_stats['misses']}, доля попаданий {search_stats['hit_rate']:.0%}")
+        dispatcher.stop()
+        ui_stats = dispatcher.stats()
+        print(f"Очередь интерфейса: поставлено {ui_stats['posted']}, склеено {ui_stats['coalesced']}, выполнено {ui_stats['executed']}, "
+              f"ошибок {ui_stats['failed']}, макс. глубина {ui_stats['max_depth']}, тактов {ui_stats['ticks']} "
+              f"(из них упёрлись в бюджет {ui_stats['over_budget_ticks']}), макс. такт {ui_stats['max_tick_time'] * 1000:.1f} мс")
         pygame.mixer.quit()
         self.master.destroy()
 
     def handle_drop(self, event):
         filepaths = self.master.tk.splitlist(event.data)
-        supported_extensions = (".mp3", ".wav", ".ogg", ".flac")
-        audio_files = [path for path in filepaths if path.lower().endswith(supported_extensions)]
+        # Папки раскрываются уже в фоновом потоке импорта
+        audio_files = [path for path in filepaths if os.path.isdir(path) or path.lower().endswith(importer.SUPPORTED_EXTENSIONS)]
         if audio_files: self.add_tracks_by_path(audio_files)
 
-    def add_tracks_by_path(self, filepaths):
-        if not filepaths: return
-        added_count = 0
-        current_playlist = self.playlist_data.get(self.current_category)
-        is_system_playlist = self.current_category in ["Все треки", "Загруженное", FAVORITES_NAME]
+    def _make_track(self, path, metadata, cover_path=None):
+        return {"name": metadata.get('title', os.path.basename(path)), "path": path, "score": 0, "cover_path": cover_path, "play_count": 0, "album": metadata.get('album', 'Неизвестный альбом'), "artist": metadata.get('artist', 'Неизвестный исполнитель'), "duration": metadata.get('duration', 0), "date_added": time.time(), "volume_multiplier": 1.0}
 
-        for path in filepaths:
+    def add_tracks_by_path(self, filepaths, target_playlist=None):
+        """Запускает фоновый импорт; треки появляются в списке пачками по мере чтения тегов."""
+        if not filepaths: return
+        job = importer.ImportJob(filepaths, known_paths=frozenset(self.library.ids_by_path), target_playlist=target_playlist or self.current_category, metadata_cache=data_manager.get_metadata_cache())
+        if self.import_job:
+            self._import_queue.append(job)
+            return
+        self._start_import(job)
+
+    def _start_import(self, job):
+        self.import_job = job
+        job.start()
+        self._update_import_progress()
+        self.after(100, self._poll_import)
+
+    def cancel_import(self):
+        if self.import_job: self.import_job.cancel()
+        for job in self._import_queue: job.cancel()
+
+    def _poll_import(self):
+        job = self.import_job
+        if job is None: return
+        results, done = job.take_results()
+        if results: self._apply_import_batch(job, results)
+        if done or job.cancelled:
+            self._finish_import(job)
+        else:
+            self._update_import_progress()
+            self.after(100, self._poll_import)
+
+    def _apply_import_batch(self, job, results):
+        is_system_playlist = job.target_playlist in data_manager.SYSTEM_PLAYLISTS
+        for path, metadata in results:
+            track_data = self.library.get_by_path(path) or self._make_track(path, metadata or {})
+            track_id = self.library.add_track(track_data)
             # Добавляем в "Все треки" если его там нет
-            if not any(t['path'] == path for t in self.playlist_data["Все треки"]):
-                metadata = self._get_track_metadata(path)
-                track_data = {"name": metadata.get('title', os.path.basename(path)), "path": path, "score": 0, "cover_path": None, "play_count": 0, "album": metadata.get('album', 'Неизвестный альбом'), "artist": metadata.get('artist', 'Неизвестный исполнитель'), "duration": metadata.get('duration', 0), "date_added": time.time(), "volume_multiplier": 1.0}
-                self.playlist_data["Все треки"].append(track_data)
-                added_count += 1
-                # Если текущий плейлист не системный, добавляем трек и в него
-                if not is_system_playlist and not any(t['path'] == path for t in current_playlist):
-                    current_playlist.append(track_data)
-            # Если трек уже есть в "Всех треках", но не в текущем (пользовательском) плейлисте
-            elif not is_system_playlist and not any(t['path'] == path for t in current_playlist):
-                # Находим данные трека и добавляем
-                track_data = next((t for t in self.playlist_data["Все треки"] if t['path'] == path), None)
-                if track_data:
-                    current_playlist.append(track_data)
-
-        if added_count > 0:
-            messagebox.showinfo("Треки добавлены", f"{added_count} новых трек(ов) успешно добавлено в медиатеку.")
-        
-        # Обновляем вид в любом случае, так как пользовательский плейлист мог измениться
-        self.view_cache.clear() # Проще всего очистить весь кеш
-        self.show_view(f"playlist_{self.current_category}")
-        data_manager.save_playlist(self.playlist_data)
+            if self.library.add_to_playlist("Все треки", track_id):
+                job.added += 1
+            # Если целевой плейлист не системный, добавляем трек и в него
+            if not is_system_playlist:
+                self.library.add_to_playlist(job.target_playlist, track_id)
+
+    def _finish_import(self, job):
+        self.import_job = None
+        data_manager.save_playlist(self.library)
+        frame = self.current_content_frame
+        if frame and frame.winfo_exists():
+            frame.update_import_progress(None, finished_text=f"Добавлено новых треков: {job.added}")
+        while self._import_queue:
+            next_job = self._import_queue.pop(0)
+            if not next_job.cancelled:
+                next_job.known_paths = frozenset(self.library.ids_by_path)
+                self._start_import(next_job)
+                break
+
+    def _update_import_progress(self):
+        if self.current_content_frame and self.current_content_frame.winfo_exists():
+            self.current_content_frame.update_import_progress(self.import_job)
+
+    # --- Папки медиатеки ---
+    def add_library_folder(self):
+        folder = filedialog.askdirectory(title="Выберите папку с музыкой")
+        if not folder: return
+        folder = os.path.normpath(folder)
+        if folder in self.library_folders: return
+        self.library_folders.append(folder)
+        self.save_current_config()
+        self.rescan_library_folders()
 
+    def remove_library_folder(self, folder):
+        """Перестаёт следить за папкой; уже добавленные из неё треки остаются в медиатеке."""
+        if folder not in self.library_folders: return
+        self.library_folders.remove(folder)
+        self.save_current_config()
 
-    def add_downloaded_track(self, file_path, cover_path=None):
+    def rescan_library_folders(self):
+        if self.scan_job or not self.library_folders: return
+        self.scan_job = FolderScanJob(self.library_folders, frozenset(self.library.ids_by_path), data_manager.load_folder_snapshot())
+        self.scan_job.start()
+        self.after(200, self._poll_folder_scan)
+
+    def _poll_folder_scan(self):
+        job = self.scan_job
+        if job is None: return
+        if not job.finished:
+            self.after(200, self._poll_folder_scan); return
+        self.scan_job = None
+        if job.cancelled: return
+        self._apply_folder_scan(job)
+
+    def _apply_folder_scan(self, job):
+        """Переносит найденные при сканировании перемещения и удаления в медиатеку, новые файлы отдаёт импорту."""
+        current_playlist = self.playlist_data.get(self.current_category, [])
+        playing_id = current_playlist[self.current_track_index] if 0 <= self.current_track_index < len(current_playlist) else None
+
+        for old_path, new_path in job.moved:
+            self.library.rename_path(old_path, new_path)
+        removed_ids = {self.library.ids_by_path[p] for p in job.removed if p in self.library.ids_by_path}
+        if removed_ids:
+            # Номер играющего трека сдвигает _on_library_event
+            self.library.remove_tracks(removed_ids)
+            if playing_id in removed_ids: self.stop()
+        data_manager.save_folder_snapshot(job.new_snapshot)
+        if job.moved or removed_ids:
+            data_manager.save_playlist(self.library)
+        print(f"Сканирование папок: {job.dirs_scanned} папок, новых {len(job.added)}, перемещено {len(job.moved)}, удалено {len(removed_ids)}")
+        if job.added: self.add_tracks_by_path(job.added, target_playlist="Все треки")
+
+    def _on_downloads_changed(self):
+        for file_path, cover_path in self.download_manager.take_completed():
+            self.add_downloaded_track(file_path, cover_path, notify=False)
+        frame = self.current_content_frame
+        if frame and frame.winfo_exists() and frame.view_id == "search":
+            frame.update_download_panel(self.download_manager)
+
+    def add_downloaded_track(self, file_path, cover_path=None, notify=True):
         """Обрабатывает трек, скачанный через поиск."""
-        metadata = self._get_track_metadata(file_path)
-        track_data = {
-            "name": metadata.get('title', os.path.basename(file_path)),
-            "path": file_path,
-            "cover_path": cover_path,
-            "album": metadata.get('album', 'Неизвестный альбом'),
-            "artist": metadata.get('artist', 'Неизвестный исполнитель'),
-            "duration": metadata.get('duration', 0),
-            "date_added": time.time(),
-            "score": 0,
-            "play_count": 0,
-            "volume_multiplier": 1.0
-        }
+        track_data = self.library.get_by_path(file_path) or self._make_track(file_path, self._get_track_metadata(file_path), cover_path)
 
         # Добавляем в "Загруженное" и "Все треки"
+        track_id = self.library.add_track(track_data)
         for category_name in ["Все треки", "Загруженное"]:
-            if not any(t['path'] == file_path for t in self.playlist_data[category_name]):
-                self.playlist_data[category_name].append(track_data)
-        
-        # Сбрасываем кеш для этих плейлистов, чтобы они обновились
-        self.view_cache.pop(f"playlist_Все треки", None)
-        self.view_cache.pop(f"playlist_Загруженное", None)
-
-        # Если пользователь смотрит один из этих плейлистов, обновляем вид
-        if self.current_category in ["Все треки", "Загруженное"]:
-            self.show_view(f"playlist_{self.current_category}")
+            self.library.add_to_playlist(category_name, track_id)
         
-        data_manager.save_playlist(self.playlist_data)
-        messagebox.showinfo("Загрузка завершена", f"Трек '{track_data['name']}' добавлен в 'Загруженное'.")
+        data_manager.save_playlist(self.library)
+        if notify: messagebox.showinfo("Загрузка завершена", f"Трек '{track_data['name']}' добавлен в 'Загруженное'.")
 
 
     def add_track(self):
@@ -219,8 +361,7 @@ class RaZPlayer(ctk.CTkFrame):
     def remove_tracks(self, indices_to_remove):
         if not indices_to_remove or not self.current_content_frame: return
     
-        current_playlist_view = self.playlist_data[self.current_category]
-        tracks_to_remove_info = [current_playlist_view[i] for i in indices_to_remove]
+        tracks_to_remove_info = [self.library.track_at(self.current_category, i) for i in indices_to_remove]
         
         track_names = "\n".join([f"- {t['name']}" for t in tracks_to_remove_info[:5]])
         if len(tracks_to_remove_info) > 5: track_names += "\n..."
@@ -234,26 +375,18 @@ class RaZPlayer(ctk.CTkFrame):
     
         if not messagebox.askyesno("Подтверждение удаления", msg): return
     
-        paths_to_remove = {t['path'] for t in tracks_to_remove_info}
+        ids_to_remove = {t['id'] for t in tracks_to_remove_info}
     
-        # --- БЛОК С КРИТИЧЕСКОЙ ОШИБКОЙ (os.remove) ПОЛНОСТЬЮ ЗАМЕНЕН ---
+        # Открытые виды затронутых плейлистов обновятся по событиям медиатеки
         if is_all_tracks_view:
             # Если мы в "Все треки", удаляем упоминания о треке из ВСЕХ плейлистов
-            for category in self.playlist_data:
-                self.playlist_data[category] = [t for t in self.playlist_data[category] if t.get('path') not in paths_to_remove]
-            # Очищаем весь кеш, так как затронуты все плейлисты
-            self.view_cache.clear() 
+            self.library.remove_tracks(ids_to_remove)
         else:
             # Если мы в обычном плейлисте, удаляем только из него
-            self.playlist_data[self.current_category] = [t for t in current_playlist_view if t.get('path') not in paths_to_remove]
-            # Очищаем кеш только для этого плейлиста
-            if f"playlist_{self.current_category}" in self.view_cache:
-                del self.view_cache[f"playlist_{self.current_category}"]
-        # --- КОНЕЦ ИСПРАВЛЕННОГО БЛОКА ---
+            self.library.remove_from_playlist(self.current_category, ids_to_remove)
     
         self.stop()
-        self.show_view(f"playlist_{self.current_category}")
-        data_manager.save_playlist(self.playlist_data)
+        data_manager.save_playlist(self.library)
 
 
     def select_and_play(self, index):
@@ -272,19 +405,14 @@ class RaZPlayer(ctk.CTkFrame):
         current_playlist = self.playlist_data.get(self.current_category, [])
         if not (0 <= self.current_track_index < len(current_playlist)): self.stop(); return
 
-        track_info = current_playlist[self.current_track_index]
+        track_info = self.library.get(current_playlist[self.current_track_index])
         track_path = track_info.get('path')
 
         try:
             pygame.mixer.music.load(track_path)
 
             if not track_info.get('duration'):
-                 metadata = self._get_track_metadata(track_path)
-                 track_info.update(metadata)
-                 for category in self.playlist_data.values():
-                     for track in category:
-                         if track.get('path') == track_path:
-                             track.update(metadata)
+                 self._update_track(track_info['id'], duration=self._get_track_metadata(track_path).get('duration', 0))
 
             self.current_song_length = track_info.get('duration', 0)
             self.last_seek_position = start_time
@@ -341,7 +469,6 @@ class RaZPlayer(ctk.CTkFrame):
     def next_track(self):
         track_list = self.playlist_data.get(self.current_category, [])
         if not track_list: return
-        data_manager.save_playlist(self.playlist_data)
         
         if self.is_recommend_mode:
             new_index = self._get_recommended_track_index()
@@ -355,7 +482,6 @@ class RaZPlayer(ctk.CTkFrame):
     def prev_track(self):
         track_list = self.playlist_data.get(self.current_category, [])
         if not track_list: return
-        data_manager.save_playlist(self.playlist_data)
         
         current_pos = self.last_seek_position + (pygame.mixer.music.get_pos() / 1000)
         if current_pos > 3:
@@ -379,13 +505,8 @@ class RaZPlayer(ctk.CTkFrame):
             if not is_busy and not self.seeking:
                 if self.current_song_length > 0 and (current_pos / self.current_song_length) > 0.6:
                     if 0 <= self.current_track_index < len(self.playlist_data[self.current_category]):
-                        track_info = self.playlist_data[self.current_category][self.current_track_index]
-                        track_path = track_info.get('path')
-
-                        for category in self.playlist_data.values():
-                            for track in category:
-                                if track.get('path') == track_path:
-                                    track['play_count'] = track.get('play_count', 0) + 1
+                        track_info = self.library.track_at(self.current_category, self.current_track_index)
+                        self._update_track(track_info['id'], play_count=track_info.get('play_count', 0) + 1)
 
                         self.player_bar.update_track_info_display(track_info)
 
@@ -422,7 +543,7 @@ class RaZPlayer(ctk.CTkFrame):
     def set_theme(self, theme_name):
         if self.theme_name != theme_name:
             self.theme_name = theme_name
-            self.view_cache.clear() 
+            self._drop_views()
             self.apply_theme()
             self.save_current_config()
             if self.current_content_frame:
@@ -465,7 +586,7 @@ class RaZPlayer(ctk.CTkFrame):
             
         effective_volume = self.last_volume
         if self.is_playing and self.current_track_index != -1 and self.playlist_data.get(self.current_category):
-            track_info = self.playlist_data[self.current_category][self.current_track_index]
+            track_info = self.library.track_at(self.current_category, self.current_track_index)
             effective_volume *= track_info.get('volume_multiplier', 1.0)
             
         pygame.mixer.music.set_volume(min(effective_volume, 1.0))
@@ -481,22 +602,13 @@ class RaZPlayer(ctk.CTkFrame):
         else:
             self.set_volume(getattr(self, '_unmuted_volume', 100.0))
         
+    def _update_track(self, track_id, **fields):
+        """Меняет поля трека в медиатеке (виды обновятся по событию) и пишет изменение в журнал."""
+        self.library.update_track(track_id, **fields)
+        data_manager.update_track(track_id, **fields)
+
     def _get_track_metadata(self, path):
-        metadata = {}
-        try:
-            audio = mutagen.File(path, easy=True)
-            if audio is None: raise mutagen.MutagenError("Не удалось прочитать теги")
-            metadata['duration'] = audio.info.length
-            if 'title' in audio: metadata['title'] = audio['title'][0]
-            if 'artist' in audio: metadata['artist'] = audio['artist'][0]
-            if 'album' in audio: metadata['album'] = audio['album'][0]
-        except Exception:
-            try:
-                sound = self.pygame.mixer.Sound(path)
-                metadata['duration'] = sound.get_length()
-            except self.pygame.error:
-                metadata['duration'] = 0
-        return metadata
+        return importer.read_cached_metadata(path, data_manager.get_metadata_cache())
 
     def change_album_art(self, album_name):
         new_cover_path = filedialog.askopenfilename(
@@ -505,36 +617,24 @@ class RaZPlayer(ctk.CTkFrame):
         )
         if not new_cover_path: return
 
-        for category in self.playlist_data.values():
-            for track in category:
-                if track.get('album') == album_name:
-                    track['cover_path'] = new_cover_path
+        for track_id in [i for i, track in self.library.tracks.items() if track.get('album') == album_name]:
+            self.library.update_track(track_id, cover_path=new_cover_path)
                     
-        data_manager.save_playlist(self.playlist_data)
-        
-        self.view_cache.clear()
-        if self.current_content_frame:
-            self.show_view(self.current_content_frame.view_id)
+        data_manager.save_playlist(self.library)
 
 
     def set_track_volume(self, indices):
         if len(indices) != 1: return
-        track_info = self.playlist_data[self.current_category][indices[0]]
+        track_info = self.library.track_at(self.current_category, indices[0])
         
         dialog = VolumeDialog(self.master, track_info.get('volume_multiplier', 1.0))
         new_multiplier = dialog.result
         
         if new_multiplier is not None:
-            track_path = track_info.get('path')
-            for category in self.playlist_data.values():
-                for track in category:
-                    if track.get('path') == track_path:
-                        track['volume_multiplier'] = new_multiplier
+            self._update_track(track_info['id'], volume_multiplier=new_multiplier)
 
             if self.current_track_index == indices[0]:
                 self.set_volume(self.player_bar.volume_slider.get())
-            
-            data_manager.save_playlist(self.playlist_data)
     
     def add_tracks_to_playlist(self, indices_to_add):
         if not indices_to_add: return
@@ -550,19 +650,11 @@ class RaZPlayer(ctk.CTkFrame):
         playlist_name = dialog.result
 
         if playlist_name and playlist_name in self.playlist_data:
-            tracks_to_add = [self.playlist_data[self.current_category][i] for i in indices_to_add]
-            target_playlist = self.playlist_data[playlist_name]
-            added_count = 0
-
-            for track in tracks_to_add:
-                if not any(t['path'] == track['path'] for t in target_playlist):
-                    target_playlist.append(track)
-                    added_count += 1
+            ids_to_add = [self.playlist_data[self.current_category][i] for i in indices_to_add]
+            added_count = sum(self.library.add_to_playlist(playlist_name, track_id) for track_id in ids_to_add)
 
             if added_count > 0:
-                if f"playlist_{playlist_name}" in self.view_cache:
-                    del self.view_cache[f"playlist_{playlist_name}"]
-                data_manager.save_playlist(self.playlist_data)
+                data_manager.save_playlist(self.library)
                 messagebox.showinfo("Успешно", f"{added_count} трек(ов) добавлено в '{playlist_name}'.")
             else:
                 messagebox.showinfo("Информация", "Все выбранные треки уже есть в этом плейлисте.")
@@ -572,10 +664,10 @@ class RaZPlayer(ctk.CTkFrame):
 
     def add_category(self, new_cat_name):
         if new_cat_name and new_cat_name not in self.playlist_data:
-            self.playlist_data[new_cat_name] = []
+            self.library.create_playlist(new_cat_name)
             self.sidebar.update_playlist_list(list(self.playlist_data.keys()))
             self.sidebar.select_playlist_button(new_cat_name)
-            data_manager.save_playlist(self.playlist_data)
+            data_manager.save_playlist(self.library)
         elif not new_cat_name:
             messagebox.showwarning("Ошибка", "Имя категории не может быть пустым.")
         else:
@@ -586,70 +678,47 @@ class RaZPlayer(ctk.CTkFrame):
             messagebox.showerror("Ошибка", f"Нельзя удалить системную категорию '{cat_to_delete}'."); return
         
         if messagebox.askyesno("Подтверждение", f"Вы уверены, что хотите удалить плейлист '{cat_to_delete}'? Треки останутся в медиатеке."):
-            if f"playlist_{cat_to_delete}" in self.view_cache:
-                del self.view_cache[f"playlist_{cat_to_delete}"]
+            self._drop_views([f"playlist_{cat_to_delete}"])
             
-            del self.playlist_data[cat_to_delete]
+            self.library.drop_playlist(cat_to_delete)
             
             self.sidebar.update_playlist_list(list(self.playlist_data.keys()))
             self.sidebar.select_playlist_button("Все треки")
-            data_manager.save_playlist(self.playlist_data)
+            data_manager.save_playlist(self.library)
             
     def toggle_shuffle(self): self.is_shuffle = not self.is_shuffle; self.player_bar.update_mode_buttons()
     def toggle_repeat(self): self.is_repeat = not self.is_repeat; self.player_bar.update_mode_buttons()
     def toggle_recommend_mode(self): self.is_recommend_mode = not self.is_recommend_mode; self.player_bar.update_mode_buttons()
         
     def _get_recommended_track_index(self):
-        track_list = self.playlist_data.get(self.current_category, [])
+        track_list = self.library.playlist_tracks(self.current_category)
         if not track_list: return -1
         
         weights = [max(0.1, 10 + track.get('score', 0)) for track in track_list]
         
         try:
-            chosen_track = random.choices(track_list, weights=weights, k=1)[0]
-            return track_list.index(chosen_track)
+            return random.choices(range(len(track_list)), weights=weights, k=1)[0]
         except IndexError:
             return 0 if track_list else -1
         
     def toggle_favorite(self):
         if self.current_track_index == -1: return
         
-        track_info = dict(self.playlist_data[self.current_category][self.current_track_index])
-        fav_list = self.playlist_data.get(FAVORITES_NAME, [])
-        
-        found_track_in_fav = -1
-        for i, fav_track in enumerate(fav_list):
-            if fav_track['path'] == track_info['path']:
-                found_track_in_fav = i
-                break
+        track_id = self.playlist_data[self.current_category][self.current_track_index]
         
-        if found_track_in_fav != -1:
-            fav_list.pop(found_track_in_fav)
+        if self.library.contains(FAVORITES_NAME, track_id):
+            self.library.remove_from_playlist(FAVORITES_NAME, [track_id])
         else:
-            fav_list.append(track_info)
-        
-        if f"playlist_{FAVORITES_NAME}" in self.view_cache:
-            del self.view_cache[f"playlist_{FAVORITES_NAME}"]
-        
-        if self.current_category == FAVORITES_NAME:
-            self.show_view(f"playlist_{FAVORITES_NAME}")
+            self.library.add_to_playlist(FAVORITES_NAME, track_id)
             
-        data_manager.save_playlist(self.playlist_data)
+        data_manager.save_playlist(self.library)
         self.player_bar.update_fav_button_status()
 
 
     def _rate_track(self, value):
         if self.current_track_index == -1: return
-        current_path = self.playlist_data[self.current_category][self.current_track_index]['path']
-
-        for category in self.playlist_data:
-            for track in self.playlist_data[category]:
-                if track.get('path') == current_path:
-                    track['score'] = track.get('score', 0) + value
-
-        data_manager.save_playlist(self.playlist_data)
-        
-        current_track_info = self.playlist_data[self.current_category][self.current_track_index]
+        current_track_info = self.library.track_at(self.current_category, self.current_track_index)
+        self._update_track(current_track_info['id'], score=current_track_info.get('score', 0) + value)
         self.player_bar.update_track_info_display(current_track_info)
 
     def like_track(self): self._rate_track(1)
@@ -0,0 +1,75 @@
+# app/metadata_cache.py
+import json
+import os
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+
+class MetadataCache:
+    """Кеш прочитанных тегов, длительности и параметров кодека.
+
+    Запись действительна, пока у файла не изменились размер и время
+    модификации: повторный импорт неизменного файла стоит одного os.stat.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, path, size, mtime_ns):
+        """Возвращает сохранённые метаданные или None, если записи нет или файл изменился."""
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, data FROM metadata WHERE path = ?", (path,)).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            self.misses += 1
+            return None
+        try:
+            metadata = json.loads(row[2])
+        except json.JSONDecodeError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return metadata
+
+    def put_many(self, entries):
+        """Сохраняет пачку записей (путь, размер, mtime_ns, метаданные) одной транзакцией."""
+        rows = [(path, size, mtime_ns, json.dumps(metadata, ensure_ascii=False)) for path, size, mtime_ns, metadata in entries]
+        if not rows: return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO metadata (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)", rows)
+
+    def put(self, path, size, mtime_ns, metadata):
+        self.put_many([(path, size, mtime_ns, metadata)])
+
+    def forget(self, paths):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM metadata WHERE path = ?", [(p,) for p in paths])
+
+
+def file_key(path):
+    """(размер, mtime_ns) файла или None, если его нет."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
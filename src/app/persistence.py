@@ -0,0 +1,106 @@
+# app/persistence.py
+import threading
+import time
+
+
+class PersistenceWorker:
+    """Фоновый поток, через который проходят все записи на диск.
+
+    Вызывающий код только отмечает, что нужно сохранить (submit), и сразу
+    возвращается. Повторные запросы с тем же ключом, пришедшие до записи,
+    склеиваются: остаются последние аргументы, именованные аргументы
+    объединяются. Так серия изменений превращается в одну запись.
+    Записи выполняются в порядке последнего submit для каждого ключа.
+    """
+
+    def __init__(self, delay=0.5):
+        self.delay = delay
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._busy = False
+        self._write_lock = threading.Lock()
+        self._stopped = False
+        self._thread = None
+        self._stats = {
+            "requested": 0, "performed": 0, "coalesced": 0, "failed": 0, "bytes": 0,
+            "last_latency": 0.0, "max_latency": 0.0, "total_latency": 0.0,
+            "max_submit_time": 0.0,
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="RaZ-persistence", daemon=True)
+            self._thread.start()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Ставит запись в очередь. Функция записи может вернуть число записанных байт."""
+        started = time.perf_counter()
+        with self._cond:
+            self._stats["requested"] += 1
+            previous = self._pending.pop(key, None)
+            if previous is not None and previous[0] is fn:
+                self._stats["coalesced"] += 1
+                kwargs = {**previous[2], **kwargs}
+            self._pending[key] = (fn, args, kwargs)
+            self._cond.notify()
+            self._stats["max_submit_time"] = max(self._stats["max_submit_time"], time.perf_counter() - started)
+        if self._thread is None or self._stopped:
+            # Поток не запущен (или уже остановлен) — пишем сразу, чтобы ничего не потерять
+            self._drain()
+
+    def flush(self):
+        """Немедленно записывает всё отложенное (дожидаясь записи, если она уже идёт)."""
+        self._drain()
+
+    def stop(self):
+        """Записывает отложенное и останавливает поток; последующие submit пишут сразу."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        stats["avg_latency"] = stats["total_latency"] / stats["performed"] if stats["performed"] else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped: return
+            # Даём серии изменений накопиться, прежде чем писать
+            time.sleep(self.delay)
+            self._drain()
+
+    def _drain(self):
+        with self._write_lock:
+            self._write_batch()
+
+    def _write_batch(self):
+        with self._cond:
+            batch, self._pending = self._pending, {}
+            self._busy = True
+        try:
+            for fn, args, kwargs in batch.values():
+                started = time.perf_counter()
+                try:
+                    written = fn(*args, **kwargs)
+                except Exception as e:
+                    print(f"Ошибка фоновой записи ({getattr(fn, '__name__', fn)}): {e}")
+                    with self._cond: self._stats["failed"] += 1
+                    continue
+                latency = time.perf_counter() - started
+                with self._cond:
+                    self._stats["performed"] += 1
+                    self._stats["bytes"] += written if isinstance(written, int) else 0
+                    self._stats["last_latency"] = latency
+                    self._stats["max_latency"] = max(self._stats["max_latency"], latency)
+                    self._stats["total_latency"] += latency
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
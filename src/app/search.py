@@ -1,32 +1,23 @@
 # src/app/search.py
 import os
+import queue
 import time
 import threading
 import yt_dlp
-from tkinter import messagebox
-import customtkinter as ctk
-from PIL import Image
-import requests
-from io import BytesIO
 from . import data_manager
 
 DOWNLOAD_PATH = os.path.join(data_manager.DATA_DIR, "music")
 FFMPEG_PATH = os.path.join(data_manager.APP_ROOT, "ffmpeg.exe") 
 
-def load_image_from_url(url, size, callback):
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        image_data = BytesIO(response.content)
-        pil_image = Image.open(image_data)
-        ctk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=size)
-        callback(ctk_image)
-    except Exception as e:
-        print(f"Ошибка загрузки обложки: {e}")
-        callback(None)
+# Источники поиска yt-dlp: префикс поискового запроса и сколько секунд ждать ответа
+SEARCH_SOURCES = [
+    {"name": "YouTube", "prefix": "ytsearch7", "timeout": 15},
+    {"name": "SoundCloud", "prefix": "scsearch7", "timeout": 15},
+]
 
-def start_image_load_thread(url, size, callback):
-    threading.Thread(target=load_image_from_url, args=(url, size, callback), daemon=True).start()
+def register_search_source(name, prefix, timeout=15):
+    """Добавляет источник поиска: prefix — поисковый префикс экстрактора yt-dlp (вида "ytsearch7")."""
+    SEARCH_SOURCES.append({"name": name, "prefix": prefix, "timeout": timeout})
 
 def start_search_thread(app):
     query = app.current_content_frame.search_entry.get()
@@ -39,69 +30,111 @@ def start_search_thread(app):
         widget.destroy()
         
     app.search_results_cache = []
-    app.current_content_frame.search_status_label.configure(text="Идет поиск...")
-    app.current_content_frame.search_button.configure(state="disabled")
-    threading.Thread(target=search_tracks_parallel, args=(app, query), daemon=True).start()
+    if app.search_job: app.search_job.cancel()
+    frame = app.current_content_frame
+    # Повторный запрос показываем сразу из кеша; устаревший — показываем и обновляем в фоне
+    cached, fresh = data_manager.get_search_cache().get(query)
+    if cached is not None:
+        app.search_results_cache = cached
+        frame.display_search_results()
+        if fresh: return
+        frame.update_search_status(f"Найдено: {len(cached)} треков (из кеша, обновляется...)", searching=True)
+    else:
+        frame.update_search_status("Идет поиск...", searching=True)
+    app.search_job = SearchJob(query)
+    app.search_job.start()
+    # Без кеша результаты показываются по мере ответа источников; при обновлении кеша — одной заменой в конце
+    app.after(100, _poll_search, app, app.search_job, frame, cached is None)
 
-def _search_source(query, source, result_list):
-    ydl_opts = {'format': 'bestaudio', 'noplaylist': True, 'default_search': source, 'quiet': True, 'extract_flat': 'in_playlist'}
+def _search_source(query, source):
+    ydl_opts = {'format': 'bestaudio', 'noplaylist': True, 'default_search': source["prefix"], 'quiet': True, 'extract_flat': 'in_playlist', 'socket_timeout': source["timeout"]}
+    results = []
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            search_result = ydl.extract_info(query, download=False)
+            search_result = ydl.extract_info(f"{source['prefix']}:{query}", download=False)
             if 'entries' in search_result:
                 for entry in search_result['entries']:
                     if entry.get('ie_key') == 'Youtube':
                         video_id = entry.get('id')
                         if video_id: entry['thumbnail'] = f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg"
-                    if entry.get('thumbnail'): result_list.append(entry)
+                    if entry.get('thumbnail'): results.append(entry)
     except Exception as e:
-        print(f"Ошибка при поиске на {source}: {e}")
+        print(f"Ошибка при поиске на {source['name']}: {e}")
+    return results
 
-def search_tracks_parallel(app, query):
-    threads = []
-    results = []
-    sources = ["ytsearch7", "scsearch7"]
-    for source in sources:
-        thread = threading.Thread(target=_search_source, args=(f"{source}:{query}", source, results), daemon=True)
-        threads.append(thread)
-        thread.start()
-    for thread in threads: thread.join()
-    app.search_results_cache = results
-    app.after(0, app.current_content_frame.display_search_results)
-
-def start_download_thread(app, track_data, download_btn):
-    download_btn.configure(text="...", state="disabled")
-    threading.Thread(target=download_track, args=(app, track_data, download_btn), daemon=True).start()
-
-def download_track(app, track_data, download_btn):
-    url = track_data.get('url')
-    os.makedirs(DOWNLOAD_PATH, exist_ok=True)
-    
-    filename_template = os.path.join(DOWNLOAD_PATH, '%(title)s.%(ext)s')
-    ffmpeg_location = FFMPEG_PATH if os.path.exists(FFMPEG_PATH) else "ffmpeg"
-
-    ydl_opts = {
-        'format': 'bestaudio/best', 'outtmpl': filename_template,
-        'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'}],
-        'ffmpeg_location': ffmpeg_location, 'quiet': True, 'nocheckcertificate': True
-    }
-    if app.download_covers_var.get(): ydl_opts['writethumbnail'] = True
-    
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            base_path, _ = os.path.splitext(ydl.prepare_filename(info))
-            downloaded_file_path = base_path + ".mp3"
-            cover_path = None
-            if app.download_covers_var.get():
-                for ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                    if os.path.exists(base_path + ext): cover_path = base_path + ext; break
-            if os.path.exists(downloaded_file_path):
-                app.after(0, app.add_downloaded_track, downloaded_file_path, cover_path)
-                if download_btn.winfo_exists(): app.after(0, lambda: download_btn.configure(text="✓"))
-            else: raise FileNotFoundError(f"Файл не найден после конвертации: {downloaded_file_path}")
-    except Exception as e:
-        print(f"Ошибка скачивания: {e}")
-        if download_btn.winfo_exists():
-            app.after(0, lambda: download_btn.configure(text="X", fg_color="red"))
-            app.after(1500, lambda: download_btn.configure(text="⏬", fg_color=app.THEMES[app.theme_name]["bg"], state="normal"))
\ No newline at end of file
+
+class SearchJob:
+    """Поиск сразу по всем источникам; ответ каждого забирается, как только он готов.
+
+    Источник, не ответивший за свой timeout, списывается: его поток (daemon)
+    доработает сам, но результаты уже никуда не попадут.
+    """
+
+    def __init__(self, query, sources=None):
+        self.query = query
+        self.sources = list(sources or SEARCH_SOURCES)
+        self.results = []
+        self.pending = {source["name"] for source in self.sources}
+        self.timed_out = []
+        self.cancelled = False
+        self._queue = queue.Queue()
+        self._started = None
+
+    @property
+    def finished(self):
+        return not self.pending
+
+    def start(self):
+        self._started = time.monotonic()
+        for source in self.sources:
+            threading.Thread(target=lambda s=source: self._queue.put((s["name"], _search_source(self.query, s))), name=f"RaZ-search-{source['name']}", daemon=True).start()
+
+    def cancel(self):
+        self.cancelled = True
+        self.pending.clear()
+
+    def poll(self):
+        """Возвращает результаты источников, ответивших с прошлого вызова, и списывает просроченные."""
+        new_results = []
+        while True:
+            try: name, results = self._queue.get_nowait()
+            except queue.Empty: break
+            if name in self.pending:
+                self.pending.discard(name)
+                new_results.extend(results)
+        elapsed = time.monotonic() - self._started
+        for source in self.sources:
+            if source["name"] in self.pending and elapsed > source["timeout"]:
+                self.pending.discard(source["name"])
+                self.timed_out.append(source["name"])
+                print(f"Источник {source['name']} не ответил за {source['timeout']} с")
+        self.results.extend(new_results)
+        return new_results
+
+
+def _poll_search(app, job, frame, stream):
+    if job.cancelled or job is not app.search_job: return
+    new_results = job.poll()
+    frame_alive = frame.winfo_exists()
+    if stream and new_results:
+        app.search_results_cache.extend(new_results)
+        if frame_alive: frame.append_search_results(new_results)
+    if not job.finished:
+        if frame_alive and stream: frame.update_search_status(f"Найдено: {len(job.results)} треков, ждём: {', '.join(sorted(job.pending))}...", searching=True)
+        app.after(100, _poll_search, app, job, frame, stream)
+        return
+
+    app.search_job = None
+    if job.results:
+        data_manager.get_search_cache().put(job.query, job.results)
+        if not stream:
+            app.search_results_cache = job.results
+            if frame_alive: frame.display_search_results()
+    if not frame_alive: return
+    status = f"Найдено: {len(app.search_results_cache)} треков."
+    if job.timed_out: status += f" Не ответили вовремя: {', '.join(job.timed_out)}."
+    frame.update_search_status(status, searching=False)
+
+def start_download(app, track_data):
+    """Ставит трек в очередь скачивания; ход загрузки виден в панели "Загрузки"."""
+    return app.download_manager.enqueue(track_data, app.download_covers_var.get())
@@ -0,0 +1,87 @@
+# app/search_cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Из ответа yt-dlp сохраняем только то, что нужно для показа результата и скачивания
+RESULT_FIELDS = ('id', 'ie_key', 'title', 'uploader', 'url', 'thumbnail', 'duration')
+
+
+def normalize_query(query):
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """Кеш результатов онлайн-поиска на диске: запрос -> (время, результаты).
+
+    Запись моложе ttl считается свежей и отдаётся без обращения к сети.
+    Устаревшая запись всё равно отдаётся сразу (stale-while-revalidate), а
+    вызывающий код параллельно обновляет её новым поиском. Записей не больше
+    max_entries: при переполнении вытесняются давно не запрашивавшиеся.
+    """
+
+    def __init__(self, path, ttl=6 * 3600, max_entries=200, save=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._save = save # save(path, text) — отложенная запись на диск; по умолчанию пишет сразу
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: data = json.load(f)
+            for query, entry in data.items():
+                self._entries[query] = (float(entry['time']), list(entry['results']))
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError, AttributeError):
+            self._entries.clear()
+
+    def configure(self, ttl, max_entries):
+        with self._lock:
+            self.ttl, self.max_entries = ttl, max_entries
+            self._evict()
+
+    def get(self, query):
+        """Возвращает (результаты, свежие ли они) или (None, False), если запроса в кеше нет."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = time.time() - entry[0] < self.ttl
+            if fresh: self.hits += 1
+            else: self.stale_hits += 1
+            return [dict(result) for result in entry[1]], fresh
+
+    def put(self, query, results):
+        key = normalize_query(query)
+        results = [{field: r[field] for field in RESULT_FIELDS if r.get(field) is not None} for r in results]
+        with self._lock:
+            self._entries[key] = (time.time(), results)
+            self._entries.move_to_end(key)
+            self._evict()
+        self._persist()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _persist(self):
+        with self._lock:
+            text = json.dumps({query: {'time': t, 'results': results} for query, (t, results) in self._entries.items()}, ensure_ascii=False)
+        if self._save: self._save(self.path, text)
+        else:
+            with open(self.path, 'w', encoding='utf-8') as f: f.write(text)
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.stale_hits + self.misses
+            return {'entries': len(self._entries), 'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses,
+                    'hit_rate': (self.hits + self.stale_hits) / requests if requests else 0.0}
@@ -0,0 +1,110 @@
+# app/sort_index.py
+from bisect import bisect_left, insort
+
+NUMERIC_COLUMNS = ('date_added', 'duration', 'score', 'play_count')
+TEXT_COLUMNS = ('name', 'artist', 'album')
+SORT_COLUMNS = NUMERIC_COLUMNS + TEXT_COLUMNS
+
+
+def sort_key(track, column):
+    """Нормализованный ключ сортировки: число для числовых колонок, строка в нижнем регистре для текстовых."""
+    value = track.get(column)
+    if column in NUMERIC_COLUMNS:
+        return value if isinstance(value, (int, float)) else 0
+    if column in TEXT_COLUMNS:
+        return (value or "").lower() if isinstance(value, str) else ""
+    # Прочие поля: числа идут раньше строк, разные типы между собой не сравниваются
+    return (0, value, "") if isinstance(value, (int, float)) else (1, 0, str(value or "").lower())
+
+
+class PlaylistSortIndex:
+    """Отсортированные порядки одного плейлиста по каждой колонке.
+
+    Для колонки хранится список (ключ, номер, id) по возрастанию; номер — порядок
+    добавления в плейлист, он делает сортировку устойчивой. Колонка строится при
+    первом запросе, дальше поддерживается бисекцией: добавление или изменение
+    трека — это одна вставка в отсортированный список, а не пересортировка.
+    """
+
+    def __init__(self, library, playlist_name):
+        self.library = library
+        self._ids = list(library.playlists.get(playlist_name, ()))
+        self._seq = {track_id: n for n, track_id in enumerate(self._ids)}
+        self._next_seq = len(self._ids)
+        self._entries = {} # колонка -> [(ключ, номер, id), ...]
+        self._keys = {}    # колонка -> {id: ключ}
+
+    def _column(self, column):
+        if column not in self._entries:
+            keys = {track_id: sort_key(self.library.tracks[track_id], column) for track_id in self._ids}
+            self._keys[column] = keys
+            self._entries[column] = sorted((keys[track_id], self._seq[track_id], track_id) for track_id in self._ids)
+        return self._entries[column]
+
+    def key(self, column, track_id):
+        self._column(column)
+        return self._keys[column][track_id]
+
+    def order(self, column, reverse=False):
+        """id треков в порядке сортировки по колонке."""
+        ids = [entry[2] for entry in self._column(column)]
+        if reverse: ids.reverse()
+        return ids
+
+    def insert(self, track_id):
+        if track_id in self._seq: return
+        self._ids.append(track_id)
+        seq = self._seq[track_id] = self._next_seq
+        self._next_seq += 1
+        track = self.library.tracks[track_id]
+        for column, entries in self._entries.items():
+            key = self._keys[column][track_id] = sort_key(track, column)
+            insort(entries, (key, seq, track_id))
+
+    def remove(self, positions):
+        removed = {self._ids[p] for p in positions if p < len(self._ids)}
+        self._ids = [track_id for track_id in self._ids if track_id not in removed]
+        for track_id in removed: self._seq.pop(track_id, None)
+        for column, entries in self._entries.items():
+            self._entries[column] = [entry for entry in entries if entry[2] not in removed]
+            keys = self._keys[column]
+            for track_id in removed: keys.pop(track_id, None)
+
+    def update(self, track_id, fields):
+        seq = self._seq.get(track_id)
+        if seq is None: return
+        track = self.library.tracks[track_id]
+        for column in fields:
+            if column not in self._entries: continue
+            keys, entries = self._keys[column], self._entries[column]
+            old_key, new_key = keys[track_id], sort_key(track, column)
+            if old_key == new_key: continue
+            del entries[bisect_left(entries, (old_key, seq, track_id))]
+            keys[track_id] = new_key
+            insort(entries, (new_key, seq, track_id))
+
+
+class SortIndexes:
+    """Индексы сортировки открывавшихся плейлистов; обновляются по событиям Library."""
+
+    def __init__(self, library):
+        self.library = library
+        self._indexes = {}
+        library.subscribe(self._on_library_event)
+
+    def get(self, playlist_name):
+        index = self._indexes.get(playlist_name)
+        if index is None:
+            index = self._indexes[playlist_name] = PlaylistSortIndex(self.library, playlist_name)
+        return index
+
+    def _on_library_event(self, event):
+        kind = event[0]
+        if kind == "reload": self._indexes.clear()
+        elif kind == "drop": self._indexes.pop(event[1], None)
+        elif kind == "insert":
+            if event[1] in self._indexes: self._indexes[event[1]].insert(event[2])
+        elif kind == "remove":
+            if event[1] in self._indexes: self._indexes[event[1]].remove(event[2])
+        elif kind == "update":
+            for index in self._indexes.values(): index.update(event[1], event[2])
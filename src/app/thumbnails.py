@@ -0,0 +1,82 @@
+# app/thumbnails.py
+import hashlib
+import os
+import threading
+
+from PIL import Image, ImageEnhance, ImageFilter
+
+from .data_manager import DATA_DIR
+
+THUMB_DIR = os.path.join(DATA_DIR, "thumbs")
+os.makedirs(THUMB_DIR, exist_ok=True)
+
+# Фон баннера считается в 1/BANNER_SCALE разрешения: после размытия потеря деталей не видна
+BANNER_SCALE = 4
+BANNER_BLUR_RADIUS = 7
+BANNER_BRIGHTNESS = 0.5
+
+
+def thumbnail_path(path, size, st, variant=""):
+    """Имя миниатюры зависит от пути, mtime и размера исходника: изменённая обложка получает новый файл."""
+    digest = hashlib.sha1(f"{path}|{st.st_mtime_ns}|{st.st_size}".encode("utf-8")).hexdigest()
+    return os.path.join(THUMB_DIR, f"{digest}_{variant}{size[0]}x{size[1]}.png")
+
+
+def _decode_scaled(path, size):
+    with Image.open(path) as source:
+        source.draft("RGB", size)
+        return source.convert("RGBA").resize(size, Image.Resampling.LANCZOS)
+
+
+def _render_banner(path, size):
+    img = _decode_scaled(path, size).filter(ImageFilter.GaussianBlur(BANNER_BLUR_RADIUS / BANNER_SCALE))
+    return ImageEnhance.Brightness(img).enhance(BANNER_BRIGHTNESS)
+
+
+def load_thumbnail(path, size):
+    """Возвращает RGBA-картинку обложки ровно size пикселей или None, если обложку не прочитать.
+
+    Готовая миниатюра берётся из RaZ_Data/thumbs; иначе исходник декодируется
+    один раз (JPEG — сразу в уменьшенном масштабе через draft) и сохраняется.
+    """
+    return _load_cached(path, size, "", _decode_scaled)
+
+
+def load_banner_background(path, size):
+    """Размытый и затемнённый фон баннера альбома для области size.
+
+    Картинка хранится и возвращается в 1/BANNER_SCALE разрешения — до нужного
+    размера её растягивает CTkImage.
+    """
+    small = (max(1, int(size[0]) // BANNER_SCALE), max(1, int(size[1]) // BANNER_SCALE))
+    return _load_cached(path, small, "banner_", _render_banner)
+
+
+def _load_cached(path, size, variant, render):
+    if not path: return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    size = (max(1, int(size[0])), max(1, int(size[1])))
+    thumb_path = thumbnail_path(path, size, st, variant)
+    try:
+        img = Image.open(thumb_path)
+        img.load()
+        return img
+    except (OSError, ValueError):
+        pass
+
+    try:
+        img = render(path, size)
+    except Exception as e:
+        print(f"Не удалось прочитать обложку '{path}': {e}")
+        return None
+
+    tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        img.save(tmp_path, format="PNG")
+        os.replace(tmp_path, thumb_path)
+    except OSError as e:
+        print(f"Не удалось сохранить миниатюру обложки: {e}")
+    return img
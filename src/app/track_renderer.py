@@ -3,19 +3,22 @@ import customtkinter as ctk
 import time
 import datetime
 import itertools
-from PIL import Image, ImageDraw
+from PIL import ImageDraw
 from functools import partial
-from .ui_components import Tooltip, _adjust_color_brightness
+from .ui_components import Tooltip, _adjust_color_brightness, truncate_text
+from . import thumbnails
+from .image_cache import image_nbytes, MISSING
 
 class TrackRenderer:
     def __init__(self, controller, parent_frame, fonts, image_cache):
         self.controller = controller
         self.parent_frame = parent_frame
         self.fonts = fonts
-        self.image_cache = image_cache
+        self.image_cache = image_cache # общий ImageCache
         self.placeholder_img = None
         self.track_widgets = []
         self.rendered_items_count = 0
+        self._positions = {}
         self.CHUNK_SIZE = 50
         self._lazy_load_job = None
         
@@ -30,6 +33,8 @@ class TrackRenderer:
         for item in self.track_widgets: item['widget'].destroy()
         self.track_widgets.clear()
         self.rendered_items_count = 0
+        # Позиция трека в исходном списке по id словаря — один проход вместо list.index на каждую строку
+        self._positions = {id(t): i for i, t in enumerate(self.get_original_tracks())}
         if self.group_by_album:
             self._render_album_grouped(self.get_original_tracks())
         else:
@@ -45,7 +50,7 @@ class TrackRenderer:
         if start >= end: self._lazy_load_job = None; return
         for i in range(start, end):
             track_data = self.get_sorted_data()[i]
-            original_index = original_tracks.index(track_data)
+            original_index = self._positions[id(track_data)]
             widget = self._create_track_widget(self.parent_frame, track_data, original_index, display_index=i + 1)
             widget.pack(fill="x", pady=1, padx=5)
             self.track_widgets.append({'widget': widget, 'original_index': original_index})
@@ -60,16 +65,13 @@ class TrackRenderer:
             banner.pack(fill="x", pady=(15, 5), padx=5)
             self.track_widgets.append({'widget': banner, 'original_index': -1})
             for track_data in track_list_for_album:
-                original_index = original_tracks.index(track_data)
+                original_index = self._positions[id(track_data)]
                 widget = self._create_track_widget(self.parent_frame, track_data, original_index)
                 widget.pack(fill="x", pady=1, padx=5)
                 self.track_widgets.append({'widget': widget, 'original_index': original_index})
 
     def _truncate_text(self, text, font, max_width):
-        if font.measure(text) <= max_width: return text, None
-        original_text = text
-        while font.measure(text + "...") > max_width and len(text) > 0: text = text[:-1]
-        return text + "...", original_text
+        return truncate_text(text, font, max_width)
 
     def _create_album_banner_widget(self, parent, track_data):
         colors = self.controller.THEMES[self.controller.theme_name]
@@ -145,13 +147,12 @@ class TrackRenderer:
         return row_frame
 
     def _get_cached_image(self, path, size=(48, 48)):
-        if not path or not os.path.exists(path): return self.placeholder_img
-        cache_key = f"{path}_{size[0]}"
-        if cache_key in self.image_cache: return self.image_cache[cache_key]
-        try:
-            img = Image.open(path)
-            ctk_img = ctk.CTkImage(light_image=img, size=size)
-            self.image_cache[cache_key] = ctk_img
-            return ctk_img
-        except Exception:
-            return self.placeholder_img
\ No newline at end of file
+        if not path: return self.placeholder_img
+        cache_key = (path, tuple(size), "cover")
+        ctk_img = self.image_cache.get(cache_key)
+        if ctk_img is not MISSING: return ctk_img or self.placeholder_img
+        scale = self.parent_frame._get_widget_scaling()
+        img = thumbnails.load_thumbnail(path, (round(size[0] * scale), round(size[1] * scale)))
+        ctk_img = ctk.CTkImage(light_image=img, size=size) if img else None
+        self.image_cache.put(cache_key, ctk_img, image_nbytes(img))
+        return ctk_img or self.placeholder_img
\ No newline at end of file
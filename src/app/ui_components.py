@@ -1,8 +1,16 @@
 # --- ФАЙЛ: app/ui_components.py ---
+import sys
+import tkinter
+from collections import OrderedDict
 import customtkinter as ctk
-from PIL import Image, ImageDraw
+from PIL import Image
 from tkinter import TclError
 
+# Готовые градиенты по (ширина, высота, цвет1, цвет2). Каждый держит PhotoImage размером с окно,
+# поэтому помним только несколько последних размеров — при перетаскивании окна они и повторяются
+_gradient_cache = OrderedDict()
+_GRADIENT_CACHE_SIZE = 4
+
 def _adjust_color_brightness(hex_color, factor):
     if not hex_color or not hex_color.startswith('#'): return "#000000"
     hex_color = hex_color[1:]
@@ -14,6 +22,37 @@ def _adjust_color_brightness(hex_color, factor):
     except ValueError:
         return "#000000"
 
+_truncate_cache = OrderedDict()
+_TRUNCATE_CACHE_SIZE = 20000
+
+def truncate_text(text, font, max_width):
+    """Обрезает текст с "..." под max_width пикселей. Возвращает (текст, полный текст или None).
+
+    Длина префикса ищется двоичным поиском (несколько вызовов font.measure вместо
+    одного на каждый символ), результат запоминается по (шрифт, текст, ширина).
+    """
+    if not isinstance(text, str): text = str(text)
+    key = (font.name, text, max_width)
+    result = _truncate_cache.get(key)
+    if result is not None:
+        _truncate_cache.move_to_end(key)
+        return result
+
+    if font.measure(text) <= max_width:
+        result = (text, None)
+    else:
+        # Самый длинный префикс, который вместе с "..." помещается в max_width
+        lo, hi = 0, len(text) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if font.measure(text[:mid] + "...") <= max_width: lo = mid
+            else: hi = mid - 1
+        result = (text[:lo] + "...", text)
+
+    _truncate_cache[key] = result
+    if len(_truncate_cache) > _TRUNCATE_CACHE_SIZE: _truncate_cache.popitem(last=False)
+    return result
+
 class GradientFrame(ctk.CTkFrame):
     def __init__(self, master, color1, color2, **kwargs):
         super().__init__(master, **kwargs)
@@ -33,16 +72,20 @@ class GradientFrame(ctk.CTkFrame):
         width, height = self.winfo_width(), self.winfo_height()
         if width <= 1 or height <= 1: return
         self._after_id = None
-        image = Image.new("RGB", (width, height), self._color2)
-        draw = ImageDraw.Draw(image)
-        try:
-            (r1, g1, b1), (r2, g2, b2) = self.winfo_rgb(self._color1), self.winfo_rgb(self._color2)
-        except TclError: return
-        r_ratio, g_ratio, b_ratio = float(r2 - r1) / height, float(g2 - g1) / height, float(b2 - b1) / height
-        for i in range(height):
-            nr, ng, nb = int(r1 + (r_ratio * i)), int(g1 + (g_ratio * i)), int(b1 + (b_ratio * i))
-            draw.line([(0, i), (width, i)], fill=(nr//256, ng//256, nb//256))
-        self._gradient_image = ctk.CTkImage(light_image=image, dark_image=image, size=(width, height))
+        key = (width, height, self._color1, self._color2)
+        gradient = _gradient_cache.get(key)
+        if gradient is not None: _gradient_cache.move_to_end(key)
+        else:
+            try:
+                rgb1, rgb2 = (tuple(c // 256 for c in self.winfo_rgb(color)) for color in (self._color1, self._color2))
+            except TclError: return
+            # Градиент одной операцией: маска 0..255 растягивается до высоты окна, столбец в 1 пиксель растягивает CTkImage
+            mask = Image.linear_gradient("L").resize((1, height), Image.Resampling.BILINEAR)
+            column = Image.composite(Image.new("RGB", (1, height), rgb2), Image.new("RGB", (1, height), rgb1), mask)
+            gradient = ctk.CTkImage(light_image=column, dark_image=column, size=(width, height))
+            _gradient_cache[key] = gradient
+            if len(_gradient_cache) > _GRADIENT_CACHE_SIZE: _gradient_cache.popitem(last=False)
+        self._gradient_image = gradient
         self.bg_label.configure(image=self._gradient_image)
         self.bg_label.lower()
 
@@ -77,6 +120,142 @@ class Tooltip:
         if self.id: self.widget.after_cancel(self.id); self.id = None
         if self.tooltip_window: self.tooltip_window.destroy(); self.tooltip_window = None
 
+class VirtualTrackList(ctk.CTkFrame):
+    """Прокручиваемый список строк одинаковой высоты, в котором живёт только пул видимых строк.
+
+    create_row(parent) создаёт пустую строку, bind_row(row, index) подставляет
+    в неё данные элемента index. Строка для элемента i — всегда pool[i % len(pool)],
+    поэтому при прокрутке на одну строку перепривязывается одна строка.
+    Сколько бы ни было элементов, виджетов остаётся примерно на полтора экрана.
+    """
+    OVERSCAN = 1.5
+    ROW_GAP = 2
+
+    def __init__(self, master, create_row, bind_row, release_row=None, scrollbar_button_color=None, scrollbar_button_hover_color=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self._create_row = create_row
+        self._bind_row = bind_row
+        self._release_row = release_row # вызывается, когда строка уходит из видимой области
+        self.count = 0
+        self.rows = []
+        self._row_indices = []
+        self._pitch = None
+        self._top = 0
+        self._layout_job = None
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent", corner_radius=0)
+        self.viewport.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar, button_color=scrollbar_button_color, button_hover_color=scrollbar_button_hover_color)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.viewport.bind("<Configure>", lambda e: self._schedule_layout())
+        self._bind_wheel(self.viewport)
+
+    # --- Данные ---
+    def set_count(self, count, top=None):
+        """Задаёт число элементов (и, если передана, позицию прокрутки); уже привязанные строки перепривязываются."""
+        self.count = count
+        if top is not None: self._top = top
+        self.rebind_all()
+
+    def rebind_all(self):
+        self._row_indices = [None] * len(self.rows)
+        self._layout()
+
+    def refresh(self, count, changed=()):
+        """Задаёт число элементов и перепривязывает только строки, показывающие элементы из changed."""
+        self.count = count
+        changed = set(changed)
+        self._row_indices = [None if i in changed else i for i in self._row_indices]
+        self._layout()
+
+    def row_for(self, index):
+        """Строка, которая сейчас показывает элемент index, или None, если он вне видимой области."""
+        if not self.rows: return None
+        slot = index % len(self.rows)
+        return self.rows[slot] if self._row_indices[slot] == index else None
+
+    def bound_rows(self):
+        """Пары (индекс элемента, строка) для строк, которые сейчас показывают данные."""
+        return [(i, row) for i, row in zip(self._row_indices, self.rows) if i is not None]
+
+    # --- Прокрутка ---
+    def scroll_to(self, top):
+        self._top = top
+        self._layout()
+
+    def _on_scrollbar(self, *args):
+        total = self.count * (self._pitch or 1)
+        if args[0] == "moveto": self.scroll_to(float(args[1]) * total)
+        elif args[0] == "scroll": self.scroll_to(self._top + int(args[1]) * (self._pitch or 1) * (1 if args[2] == "units" else max(1, self.viewport.winfo_height() // (self._pitch or 1))))
+
+    def _on_mousewheel(self, event):
+        if event.num == 4: steps = -1
+        elif event.num == 5: steps = 1
+        elif sys.platform == "darwin": steps = -event.delta
+        else: steps = -event.delta / 120
+        self.scroll_to(self._top + steps * 3 * (self._pitch or 20))
+
+    def _bind_wheel(self, widget):
+        # Привязываемся и к внутренним холстам CTk-виджетов: колесо приходит виджету под курсором
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tkinter.Misc.bind(widget, sequence, self._on_mousewheel, "+")
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
+
+    # --- Раскладка ---
+    def _schedule_layout(self):
+        if self._layout_job is None:
+            self._layout_job = self.after_idle(self._layout)
+
+    def _ensure_pool(self, height):
+        if self._pitch is None:
+            row = self._create_row(self.viewport)
+            self._bind_wheel(row)
+            self.rows.append(row); self._row_indices.append(None)
+            row.update_idletasks()
+            self._pitch = row.winfo_reqheight() + self.ROW_GAP
+        needed = int(height / self._pitch * self.OVERSCAN) + 2
+        if needed > len(self.rows):
+            for _ in range(needed - len(self.rows)):
+                row = self._create_row(self.viewport)
+                self._bind_wheel(row)
+                self.rows.append(row)
+            # Размер пула изменился — соответствие "элемент → строка" тоже
+            self._row_indices = [None] * len(self.rows)
+
+    def _layout(self):
+        self._layout_job = None
+        if not self.viewport.winfo_exists(): return
+        height = self.viewport.winfo_height()
+        if height <= 1 and self.count:
+            self._schedule_layout(); return
+        self._ensure_pool(height)
+        pitch, pool_size = self._pitch, len(self.rows)
+        total = self.count * pitch
+        self._top = max(0, min(self._top, total - height))
+        first = int(self._top // pitch)
+        offset = self._top - first * pitch
+
+        visible = set()
+        for index in range(first, min(first + pool_size, self.count)):
+            slot = index % pool_size
+            visible.add(slot)
+            row = self.rows[slot]
+            if self._row_indices[slot] != index:
+                self._bind_row(row, index)
+                self._row_indices[slot] = index
+            row.place(x=0, y=(index - first) * pitch - offset, relwidth=1)
+        for slot, row in enumerate(self.rows):
+            if slot not in visible:
+                if self._row_indices[slot] is not None and self._release_row: self._release_row(row)
+                row.place_forget(); self._row_indices[slot] = None
+
+        if total > height: self.scrollbar.set(self._top / total, (self._top + height) / total)
+        else: self.scrollbar.set(0, 1)
+
+
 class VolumeDialog(ctk.CTkToplevel):
     def __init__(self, master, current_multiplier):
         super().__init__(master)
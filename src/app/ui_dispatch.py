@@ -0,0 +1,99 @@
+# app/ui_dispatch.py
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from tkinter import TclError
+
+
+class UIDispatcher:
+    """Очередь обновлений интерфейса из рабочих потоков.
+
+    Рабочие потоки не трогают Tk: они вызывают post(fn, *args), а один
+    периодический after в потоке Tk разбирает очередь. За один такт
+    выполняется столько обновлений, сколько укладывается в budget_ms, остальное
+    ждёт следующего такта — интерфейс не замирает, даже если обновлений тысячи.
+    Обновления с одинаковым key склеиваются: пока первое не выполнено, новое
+    заменяет его на том же месте очереди (например, прогресс одной загрузки).
+    """
+
+    def __init__(self, interval_ms=30, budget_ms=8):
+        self.interval_ms = interval_ms
+        self.budget = budget_ms / 1000
+        self._lock = threading.Lock()
+        self._queue = OrderedDict() # key -> (fn, args)
+        self._counter = itertools.count()
+        self._widget = None
+        self._pump_job = None
+        self._stopped = False
+        self._stats = {"posted": 0, "coalesced": 0, "executed": 0, "failed": 0, "ticks": 0,
+                       "over_budget_ticks": 0, "max_depth": 0, "max_tick_time": 0.0}
+
+    def start(self, widget):
+        """Запускает разбор очереди в потоке Tk; вызывать из потока Tk."""
+        self._widget = widget
+        self._stopped = False
+        if self._pump_job is None: self._pump_job = widget.after(self.interval_ms, self._pump)
+
+    def stop(self):
+        # Может вызываться и из обработчика внутри _pump (например, при закрытии программы)
+        self._stopped = True
+        if self._pump_job is not None and self._widget is not None:
+            try: self._widget.after_cancel(self._pump_job)
+            except Exception: pass
+        self._pump_job = None
+
+    def post(self, fn, *args, key=None):
+        """Ставит вызов fn(*args) в очередь потока Tk. Можно вызывать из любого потока."""
+        with self._lock:
+            self._stats["posted"] += 1
+            if key is None: key = ("once", next(self._counter))
+            elif key in self._queue: self._stats["coalesced"] += 1
+            self._queue[key] = (fn, args)
+            self._stats["max_depth"] = max(self._stats["max_depth"], len(self._queue))
+
+    def post_idle(self, fn, *args):
+        """Как post, но fn выполняется через after_idle, вне _pump. Для модальных диалогов:
+        пока такой диалог открыт, остальные обновления продолжают выполняться."""
+        self.post(self._call_idle, fn, args)
+
+    def _call_idle(self, fn, args):
+        self._widget.after_idle(fn, *args)
+
+    def _pump(self):
+        self._pump_job = None
+        started = time.perf_counter()
+        deadline = started + self.budget
+        while True:
+            with self._lock:
+                if not self._queue: break
+                _, (fn, args) = self._queue.popitem(last=False)
+            try:
+                fn(*args)
+                self._stats["executed"] += 1
+            except Exception as e:
+                self._stats["failed"] += 1
+                print(f"Ошибка при обновлении интерфейса: {e}")
+            if self._stopped: break
+            if time.perf_counter() >= deadline:
+                self._stats["over_budget_ticks"] += 1
+                break
+        elapsed = time.perf_counter() - started
+        self._stats["ticks"] += 1
+        self._stats["max_tick_time"] = max(self._stats["max_tick_time"], elapsed)
+        if self._stopped or self._widget is None: return
+        try:
+            if self._widget.winfo_exists(): self._pump_job = self._widget.after(self.interval_ms, self._pump)
+        except TclError:
+            pass
+
+    def depth(self):
+        with self._lock:
+            return len(self._queue)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, depth=len(self._queue))
+
+
+dispatcher = UIDispatcher()
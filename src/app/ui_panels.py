@@ -3,15 +3,16 @@
 import customtkinter as ctk
 from tkinter import messagebox, Menu
 from functools import partial
-import os
 import time
 import datetime
 import itertools
-from PIL import Image, ImageDraw, ImageFilter, ImageEnhance, ImageFont
+from PIL import Image, ImageDraw, ImageFont
 
 from .ui_components import Tooltip, _adjust_color_brightness
-from .ui_components import Tooltip, _adjust_color_brightness
-from . import search, theme_manager
+from .ui_components import Tooltip, VirtualTrackList, _adjust_color_brightness, truncate_text
+from .cover_loader import CoverLoader
+from .image_cache import image_cache, image_nbytes, MISSING
+from . import search, theme_manager, thumbnails, web_thumbnails
 from .data_manager import FAVORITES_NAME
 
 def _apply_text_hover_effect(button, dim_color, bright_color):
@@ -189,23 +190,39 @@ class ContentFrame(ctk.CTkFrame):
         self.sort_reverse = True
         self.group_by_album = False # <-- Теперь это независимый флаг
         self.dynamic_column_key = 'date_added'
+        self.filter_query = "" # Фильтр по медиатеке: показываются только подходящие треки
         self.selected_indices = set()
         self.last_clicked_index = -1
         
         self.track_widgets = []
         self.sorted_track_data = []
-        self.rendered_widget_count = 0
-        self._lazy_load_job = None
+        self.sorted_positions = [] # sorted_positions[i] — индекс i-го отсортированного трека в original_tracks
+        self._sorted_rank = []     # обратное отображение: индекс в original_tracks -> позиция в сортировке
+        self.original_tracks = []
+        self.track_list = None # Виртуальный список (режим без группировки по альбомам)
+        self._position_by_id = None # id трека -> индекс в original_tracks, строится по требованию
+        self._pending_events = []   # события медиатеки, ещё не применённые к виду
+        self._events_job = None
+        self.needs_refresh = False  # скрытый вид нужно перестроить при показе
+        self._grouped_rows = {}     # индекс в original_tracks -> строка (режим группировки)
+        # Что было подсвечено при последнем update_active_track_highlight: перекрашиваются только отличия
+        self._painted_playing = -1
+        self._painted_selection = set()
+        self.BANNER_WIDTH_BUCKET = 256 # Ширина фона баннера округляется вверх до кратной, чтобы кеш не дробился при ресайзе
         self._is_rendering = False # <-- Флаг для предотвращения "рваной" прокрутки
-        self.CHUNK_SIZE = 40
         
-        self.image_cache = {}
+        self.cover_loader = CoverLoader(self)
         self.placeholder_img = None
         self.edit_icon = None
         
         self.search_entry = None
         self.search_results_frame = None
         self.search_status_label = None
+        self.download_panel = None
+        self._download_rows = {}       # id загрузки -> виджеты её строки
+        self._download_buttons = {}    # url результата поиска -> кнопка скачивания
+        self._download_panel_version = None
+        self.import_progress_frame = None
         
         try:
             self.fonts = {
@@ -221,13 +238,20 @@ class ContentFrame(ctk.CTkFrame):
                 'album_banner': ctk.CTkFont(size=22, weight="bold")
             }
         
+    def destroy(self):
+        # У каждого вида свой пул потоков для обложек; без этого он живёт, пока сборщик мусора не доберётся до кадра
+        self.cover_loader.shutdown()
+        super().destroy()
+
     def _clear_view(self):
-        if self._lazy_load_job: self.after_cancel(self._lazy_load_job)
-        self._lazy_load_job = None
+        self.cover_loader.cancel_all()
         for widget in self.winfo_children(): widget.destroy()
         self.track_widgets.clear()
         self.sorted_track_data.clear()
-        self.rendered_widget_count = 0
+        self.sorted_positions, self._sorted_rank = [], []
+        self.track_list = None
+        self._grouped_rows = {}
+        self._painted_playing, self._painted_selection = -1, set()
         
     def clear_selection(self): self.selected_indices.clear(); self.last_clicked_index = -1
     def add_to_selection(self, index): self.selected_indices.add(index); self.last_clicked_index = index
@@ -237,115 +261,226 @@ class ContentFrame(ctk.CTkFrame):
         self.configure(fg_color=colors["bg"])
         if self.view_id and self.view_id.startswith("playlist_"):
             category_name = self.view_id.replace("playlist_", "")
-            self.display_playlist_view(category_name, self.controller.playlist_data.get(category_name, []))
+            self.display_playlist_view(category_name, self.controller.library.playlist_tracks(category_name))
         elif self.view_id == "search": self.display_search_view(force_redraw=True)
         elif self.view_id == "themes": self.display_themes_view()
 
     def display_playlist_view(self, category_name, tracks):
         self._clear_view()
         self.view_id = f"playlist_{category_name}"
+        self.original_tracks = tracks
+        self._position_by_id = None
+        self.needs_refresh = False
         colors = self.controller.THEMES[self.controller.theme_name]
         self.configure(fg_color=colors["bg"])
 
+        self._create_filter_bar(self, colors)
         self._create_playlist_headers(self)
-        ctk.CTkFrame(self, height=1, fg_color=colors["frame_secondary"]).pack(fill="x", padx=10, pady=(0, 5))
+        self.header_separator = ctk.CTkFrame(self, height=1, fg_color=colors["frame_secondary"])
+        self.header_separator.pack(fill="x", padx=10, pady=(0, 5))
 
-        self.scroll_frame = ctk.CTkScrollableFrame(self, fg_color="transparent", scrollbar_button_color=colors.get("accent"), scrollbar_button_hover_color=colors.get("hover"))
-        self.scroll_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
-        self.scroll_frame.grid_columnconfigure(0, weight=1)
+        if self.group_by_album or not tracks:
+            self.scroll_frame = ctk.CTkScrollableFrame(self, fg_color="transparent", scrollbar_button_color=colors.get("accent"), scrollbar_button_hover_color=colors.get("hover"))
+            self.scroll_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+            self.scroll_frame.grid_columnconfigure(0, weight=1)
+        else:
+            # Плоский список: строк виджетов ровно столько, сколько помещается в окно (с запасом)
+            self.track_list = VirtualTrackList(self, create_row=self._create_track_row, bind_row=self._bind_virtual_row, release_row=self.cover_loader.cancel, fg_color="transparent", scrollbar_button_color=colors.get("accent"), scrollbar_button_hover_color=colors.get("hover"))
+            self.track_list.pack(fill="both", expand=True, padx=10, pady=(0, 10))
         
         footer_frame = ctk.CTkFrame(self, fg_color="transparent")
         footer_frame.pack(fill="x", padx=10, pady=10, side="bottom")
         footer_frame.grid_columnconfigure(0, weight=1)
         ctk.CTkButton(footer_frame, text="Добавить трек", command=self.controller.add_track, fg_color=colors["accent"], hover_color=colors["hover"], text_color=colors["text_on_accent"]).grid(row=0, column=0, sticky="ew")
+        if category_name == "Все треки":
+            folders_button = ctk.CTkButton(footer_frame, text="Папки", width=90, fg_color="transparent", border_width=1, text_color=colors["text"], hover_color=colors["frame_secondary"])
+            folders_button.configure(command=lambda: self._show_library_folders_menu(folders_button))
+            folders_button.grid(row=0, column=1, padx=(10, 0))
+
+        # Индикатор фонового импорта (скрыт, пока импорт не идёт)
+        self.import_progress_frame = ctk.CTkFrame(footer_frame, fg_color="transparent")
+        self.import_progress_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(8, 0))
+        self.import_progress_frame.grid_columnconfigure(1, weight=1)
+        self.import_progress_label = ctk.CTkLabel(self.import_progress_frame, text="", text_color=colors["text_dim"], font=self.fonts['artist'])
+        self.import_progress_label.grid(row=0, column=0, sticky="w", padx=(0, 10))
+        self.import_progress_bar = ctk.CTkProgressBar(self.import_progress_frame, progress_color=colors["accent"])
+        self.import_progress_bar.grid(row=0, column=1, sticky="ew")
+        self.import_cancel_button = ctk.CTkButton(self.import_progress_frame, text="Отмена", width=70, fg_color="transparent", border_width=1, text_color=colors["text_dim"], hover_color=colors["frame_secondary"], command=self.controller.cancel_import)
+        self.import_cancel_button.grid(row=0, column=2, padx=(10, 0))
+        self.update_import_progress(self.controller.import_job)
 
         if not tracks:
             ctk.CTkLabel(self.scroll_frame, text="В этом плейлисте пока нет треков", font=ctk.CTkFont(size=14), text_color=colors["text_dim"]).pack(expand=True, pady=50)
             return
 
-        key_func = lambda t: (t.get(self.current_sort_key) or 0) if isinstance(t.get(self.current_sort_key, 0), (int, float)) else (t.get(self.current_sort_key) or "").lower()
-        self.sorted_track_data = sorted(tracks, key=key_func, reverse=self.sort_reverse)
-        
-        self.scroll_frame._scrollbar.configure(command=self._on_scroll)
+        self._sort_tracks(tracks)
         
         if self.group_by_album:
             self._render_album_grouped(tracks)
+            self.update_active_track_highlight()
         else:
-            self._render_chunk(tracks)
-        
-        self.update_active_track_highlight()
-
-
-    def _on_scroll(self, *args):
-        self.scroll_frame._parent_canvas.yview(*args)
-
-        # ИЗМЕНЕНИЕ: Отменяем предыдущий запланированный вызов, чтобы избежать их наложения
-        if self._lazy_load_job:
-            self.after_cancel(self._lazy_load_job)
-            self._lazy_load_job = None
-
-        # Запускаем новый вызов только если докрутили до конца и рендеринг не идет прямо сейчас
-        if self.scroll_frame._scrollbar.get()[1] > 0.95 and not self.group_by_album and not self._is_rendering:
-            self._lazy_load_job = self.after(50, self._render_chunk, self.controller.playlist_data[self.controller.current_category])
-
-    def _render_chunk(self, original_tracks):
-        if self._is_rendering or not self.scroll_frame.winfo_exists():
+            self.track_list.set_count(len(self.sorted_track_data))
+
+
+    def _sort_index(self):
+        return self.controller.sort_indexes.get(self.view_id.replace("playlist_", ""))
+
+    def _sort_tracks(self, tracks):
+        # Порядок берётся из готового индекса плейлиста; здесь только перевод id в позиции
+        ids = self._sort_index().order(self.current_sort_key, self.sort_reverse)
+        if self.filter_query.strip(): ids = self.controller.track_search.search(self.filter_query, ids)
+        self._position_by_id = {t['id']: i for i, t in enumerate(tracks)}
+        self.sorted_positions = [self._position_by_id[i] for i in ids if i in self._position_by_id]
+        self.sorted_track_data = [tracks[i] for i in self.sorted_positions]
+        self._sorted_rank = [-1] * len(tracks) # -1 — трек скрыт фильтром
+        for rank, i in enumerate(self.sorted_positions): self._sorted_rank[i] = rank
+        if self.filter_status_label.winfo_exists():
+            self.filter_status_label.configure(text=f"{len(self.sorted_positions)} из {len(tracks)}" if self.filter_query.strip() else "")
+
+    # --- Изменения медиатеки ---
+    def on_library_event(self, event):
+        """Принимает событие Library; события, пришедшие подряд, применяются одной пачкой."""
+        if not self.view_id or not self.view_id.startswith("playlist_"): return
+        self._pending_events.append(event)
+        if self._events_job is None:
+            self._events_job = self.after_idle(self._apply_library_events)
+
+    def _apply_library_events(self):
+        self._events_job = None
+        events, self._pending_events = self._pending_events, []
+        if not self.winfo_exists() or not self.view_id.startswith("playlist_"): return
+        category_name = self.view_id.replace("playlist_", "")
+        structural = any(e[0] == "reload" or (e[0] in ("insert", "remove") and e[1] == category_name) for e in events)
+        if structural: self._position_by_id = None
+        elif self._position_by_id is None:
+            self._position_by_id = {t['id']: i for i, t in enumerate(self.original_tracks)}
+        changed = {}
+        if not structural:
+            for e in events:
+                if e[0] == "update" and e[1] in self._position_by_id:
+                    changed.setdefault(self._position_by_id[e[1]], set()).update(e[2])
+        if not structural and not changed: return
+        watched = {self.current_sort_key, 'name', 'artist', 'album'} if self.filter_query.strip() else {self.current_sort_key}
+        resort = structural or any(fields & watched for fields in changed.values())
+
+        if self.track_list is None:
+            # Пустой вид или группировка по альбомам: состав групп и баннеры проще построить заново
+            if resort or any(fields & {'album', 'artist', 'cover_path'} for fields in changed.values()):
+                self._refresh_when_visible()
+            else:
+                self._rebind_grouped_rows(changed)
             return
 
-        self._is_rendering = True
-
-        start, end = self.rendered_widget_count, min(self.rendered_widget_count + self.CHUNK_SIZE, len(self.sorted_track_data))
-
-        if start >= end:
-            self._is_rendering = False
+        if structural:
+            self._reload_tracks(category_name)
+            if not self.original_tracks:
+                self._refresh_when_visible(); return
+        if resort:
+            old_sorted = self.sorted_track_data
+            self._sort_tracks(self.original_tracks)
+            new_sorted = self.sorted_track_data
+            # Перепривязываем только строки, в которых сменился трек; у остальных обновляем позицию
+            rebind = set()
+            for i, row in self.track_list.bound_rows():
+                if i >= len(new_sorted) or i >= len(old_sorted) or new_sorted[i] is not old_sorted[i]: rebind.add(i)
+                else: row.original_index = self.sorted_positions[i]
+            self.track_list.refresh(len(new_sorted), rebind)
+        else:
+            self.track_list.refresh(len(self.sorted_track_data), [self._sorted_rank[i] for i in changed if self._sorted_rank[i] >= 0])
+
+    def _reload_tracks(self, category_name):
+        """Берёт актуальный состав плейлиста, сохраняя выделение по id треков."""
+        selected_ids = {self.original_tracks[i]['id'] for i in self.selected_indices if i < len(self.original_tracks)}
+        last_clicked_id = self.original_tracks[self.last_clicked_index]['id'] if 0 <= self.last_clicked_index < len(self.original_tracks) else None
+        self.original_tracks = self.controller.library.playlist_tracks(category_name)
+        self.selected_indices, self.last_clicked_index = set(), -1
+        for i, track in enumerate(self.original_tracks):
+            if track['id'] in selected_ids: self.selected_indices.add(i)
+            if track['id'] == last_clicked_id: self.last_clicked_index = i
+        # Позиции сдвинулись, но подсвечены по-прежнему те же треки
+        self._painted_playing, self._painted_selection = self.controller.current_track_index, set(self.selected_indices)
+
+    def _rebind_grouped_rows(self, changed):
+        colors, selected_color = self._highlight_colors()
+        for item in self.track_widgets:
+            if item.get('is_banner') or item['original_index'] not in changed: continue
+            row = item['widget']
+            if row.winfo_exists():
+                self._bind_track_row(row, self.original_tracks[item['original_index']], item['original_index'])
+                self._apply_row_highlight(row, colors, selected_color)
+
+    def _refresh_when_visible(self):
+        if self.winfo_ismapped(): self.refresh_current_view()
+        else: self.needs_refresh = True
+
+    def update_import_progress(self, job, finished_text=None):
+        frame = self.import_progress_frame
+        if frame is None or not frame.winfo_exists(): return
+        if job is None:
+            if not finished_text: frame.grid_remove(); return
+            self.import_progress_label.configure(text=finished_text)
+            self.import_progress_bar.grid_remove(); self.import_cancel_button.grid_remove()
+            frame.grid()
+            frame.after(3000, lambda: frame.winfo_exists() and frame.grid_remove())
             return
+        frame.grid(); self.import_progress_bar.grid(); self.import_cancel_button.grid()
+        if job.total:
+            self.import_progress_bar.set(job.processed / job.total)
+            self.import_progress_label.configure(text=f"Импорт: {job.processed} из {job.total}")
+        else:
+            self.import_progress_bar.set(0)
+            self.import_progress_label.configure(text="Поиск файлов...")
 
-        for i in range(start, end):
-            track_data = self.sorted_track_data[i]
-            try:
-                original_index = original_tracks.index(track_data)
-                widget = self._create_track_widget(self.scroll_frame, track_data, original_index, display_index=i + 1)
-                widget.pack(fill="x", pady=1, padx=5)
-                self.track_widgets.append({'widget': widget, 'original_index': original_index})
-            except (ValueError, IndexError):
-                # Пропускаем трек, если его по какой-то причине нет в оригинальном списке
-                # (может случиться при очень быстрых операциях с плейлистом)
-                continue
-        
-        self.rendered_widget_count = end
-
-        # ИЗМЕНЕНИЕ: Принудительно обновляем UI и снимаем блокировку с небольшой задержкой,
-        # чтобы дать event loop время на обработку.
-        self.update()
-        self.after(10, lambda: setattr(self, '_is_rendering', False))
+    def _show_library_folders_menu(self, button):
+        colors = self.controller.THEMES[self.controller.theme_name]
+        menu = Menu(self, tearoff=0, background=colors['frame'], foreground=colors['text'], activebackground=colors['accent'], activeforeground=colors['text_on_accent'], relief="flat", borderwidth=0)
+        menu.add_command(label="Добавить папку...", command=self.controller.add_library_folder)
+        menu.add_command(label="Пересканировать", command=self.controller.rescan_library_folders, state="normal" if self.controller.library_folders else "disabled")
+        if self.controller.library_folders:
+            remove_menu = Menu(menu, tearoff=0, background=colors['frame'], foreground=colors['text'], activebackground=colors['accent'], activeforeground=colors['text_on_accent'])
+            for folder in self.controller.library_folders:
+                remove_menu.add_command(label=folder, command=partial(self.controller.remove_library_folder, folder))
+            menu.add_cascade(label="Не следить за папкой", menu=remove_menu)
+        menu.tk_popup(button.winfo_rootx(), button.winfo_rooty() + button.winfo_height())
+
+    def _bind_virtual_row(self, row, index):
+        self._bind_track_row(row, self.sorted_track_data[index], self.sorted_positions[index], display_index=index + 1)
+        self._apply_row_highlight(row, *self._highlight_colors())
 
     def _render_album_grouped(self, original_tracks):
         if self._is_rendering or not self.scroll_frame.winfo_exists(): return
         self._is_rendering = True
-        album_key = lambda t: t.get('album', 'Неизвестный альбом')
+        album_key = lambda i: original_tracks[i].get('album', 'Неизвестный альбом')
         
-        # Сортируем по альбому и исполнителю для логичного порядка
-        sorted_for_grouping = sorted(self.sorted_track_data, key=lambda t: (t.get('album', '').lower(), t.get('artist', '').lower()))
-
-        for album_name, track_group in itertools.groupby(sorted_for_grouping, key=album_key):
-            track_list_for_album = list(track_group)
-            banner = self._create_album_banner_widget(self.scroll_frame, track_list_for_album[0], track_list_for_album)
+        # Группы (альбом, исполнитель) идут по алфавиту, внутри группы сохраняется текущая сортировка.
+        # Сортируются только сами группы; ключи берутся из индекса, где они уже нормализованы
+        index, groups = self._sort_index(), {}
+        for i in self.sorted_positions:
+            track_id = original_tracks[i]['id']
+            groups.setdefault((index.key('album', track_id), index.key('artist', track_id)), []).append(i)
+        sorted_for_grouping = [i for group_key in sorted(groups) for i in groups[group_key]]
+
+        for album_name, index_group in itertools.groupby(sorted_for_grouping, key=album_key):
+            album_indices = list(index_group)
+            banner = self._create_album_banner_widget(self.scroll_frame, original_tracks[album_indices[0]], album_indices)
             banner.pack(fill="x", pady=(15, 5), padx=5)
             self.track_widgets.append({'widget': banner, 'original_index': -1, 'is_banner': True})
             
-            for track_data in track_list_for_album:
-                original_index = original_tracks.index(track_data)
+            for original_index in album_indices:
+                track_data = original_tracks[original_index]
                 widget = self._create_track_widget(self.scroll_frame, track_data, original_index)
                 widget.pack(fill="x", pady=1, padx=5)
                 self.track_widgets.append({'widget': widget, 'original_index': original_index})
+                self._grouped_rows[original_index] = widget
         
         self.update()
         self._is_rendering = False
 
-    def _create_playlist_headers(self, parent):
+    def _create_playlist_headers(self, parent, before=None):
         colors = self.controller.THEMES[self.controller.theme_name]
         header_frame = ctk.CTkFrame(parent, fg_color="transparent", height=30)
-        header_frame.pack(fill="x", padx=15, pady=(10, 5))
+        header_frame.pack(fill="x", padx=15, pady=(10, 5), before=before)
+        self.header_frame = header_frame
         
         header_frame.grid_columnconfigure(0, weight=4, uniform="group1")
         header_frame.grid_columnconfigure(1, weight=50, uniform="group1")
@@ -396,7 +531,52 @@ class ContentFrame(ctk.CTkFrame):
 
     def _change_dynamic_column(self, new_key):
         self.dynamic_column_key = new_key
-        self.refresh_current_view()
+        self._resort_in_place()
+
+    def _create_filter_bar(self, parent, colors):
+        filter_frame = ctk.CTkFrame(parent, fg_color="transparent")
+        filter_frame.pack(fill="x", padx=15, pady=(10, 0))
+        filter_frame.grid_columnconfigure(0, weight=1)
+        self.filter_entry = ctk.CTkEntry(filter_frame, placeholder_text="Фильтр: название, исполнитель, альбом", height=30)
+        self.filter_entry.grid(row=0, column=0, sticky="ew")
+        if self.filter_query: self.filter_entry.insert(0, self.filter_query)
+        self.filter_entry.bind("<KeyRelease>", lambda e: self._set_filter(self.filter_entry.get()))
+        self.filter_entry.bind("<Escape>", lambda e: (self.filter_entry.delete(0, "end"), self._set_filter("")))
+        self.filter_status_label = ctk.CTkLabel(filter_frame, text="", text_color=colors["text_dim"], font=self.fonts['artist'])
+        self.filter_status_label.grid(row=0, column=1, padx=(10, 0))
+
+    def _set_filter(self, query):
+        if query == self.filter_query: return
+        self.filter_query = query
+        self._apply_filter()
+
+    def _apply_filter(self):
+        """Перефильтровывает открытый список на каждое нажатие клавиши, не трогая поле ввода."""
+        if not self.original_tracks: return
+        self._sort_tracks(self.original_tracks)
+        # Скрытые фильтром треки снимаются с выделения, иначе меню удалило бы невидимые строки
+        visible = lambda i: 0 <= i < len(self._sorted_rank) and self._sorted_rank[i] >= 0
+        self.selected_indices = set(filter(visible, self.selected_indices))
+        if not visible(self.last_clicked_index): self.last_clicked_index = -1
+        if self.track_list:
+            self.track_list.set_count(len(self.sorted_track_data), top=0)
+            self.update_active_track_highlight()
+        elif self.group_by_album:
+            self.cover_loader.cancel_all()
+            for widget in self.scroll_frame.winfo_children(): widget.destroy()
+            self.track_widgets.clear()
+            self._grouped_rows, self._painted_playing, self._painted_selection = {}, -1, set()
+            self._render_album_grouped(self.original_tracks)
+            self.update_active_track_highlight()
+
+    def _resort_in_place(self):
+        """Пересортировка плоского списка без пересоздания виджетов: новые заголовки и перепривязка видимых строк."""
+        if not self.track_list:
+            self.refresh_current_view(); return
+        self.header_frame.destroy()
+        self._create_playlist_headers(self, before=self.header_separator)
+        self._sort_tracks(self.original_tracks)
+        self.track_list.set_count(len(self.sorted_track_data), top=0)
 
     def sort_playlist(self, sort_key):
         if sort_key == '#': sort_key = 'date_added' # Клик по # сортирует по дате
@@ -408,7 +588,7 @@ class ContentFrame(ctk.CTkFrame):
         
         # --- УДАЛЕНО: Группировка больше не часть сортировки ---
         # self.group_by_album = (sort_key == 'album')
-        self.refresh_current_view()
+        self._resort_in_place()
 
     def _on_track_click(self, event, index):
         shift_pressed = (event.state & 0x0001) != 0
@@ -422,18 +602,14 @@ class ContentFrame(ctk.CTkFrame):
             else: self.add_to_selection(index)
         elif shift_pressed and self.last_clicked_index != -1:
             try:
-                current_list = self.sorted_track_data
-                start_item = self.controller.playlist_data[self.controller.current_category][self.last_clicked_index]
-                end_item = self.controller.playlist_data[self.controller.current_category][index]
-                start_idx_in_sorted = current_list.index(start_item)
-                end_idx_in_sorted = current_list.index(end_item)
+                start_idx_in_sorted = self._sorted_rank[self.last_clicked_index]
+                end_idx_in_sorted = self._sorted_rank[index]
+                if start_idx_in_sorted < 0: raise ValueError("начало диапазона скрыто фильтром")
                 if start_idx_in_sorted > end_idx_in_sorted: start_idx_in_sorted, end_idx_in_sorted = end_idx_in_sorted, start_idx_in_sorted
                 
                 self.clear_selection()
                 for i in range(start_idx_in_sorted, end_idx_in_sorted + 1):
-                    track_to_select = current_list[i]
-                    original_index = self.controller.playlist_data[self.controller.current_category].index(track_to_select)
-                    self.add_to_selection(original_index)
+                    self.add_to_selection(self.sorted_positions[i])
             except (ValueError, IndexError): 
                 self.clear_selection(); self.add_to_selection(index)
 
@@ -462,94 +638,123 @@ class ContentFrame(ctk.CTkFrame):
         
         context_menu.tk_popup(event.x_root, event.y_root)
 
-    def update_active_track_highlight(self):
-        if not self.winfo_exists(): return
+    def _row_for(self, original_index):
+        """Показанная сейчас строка трека с этим индексом в original_tracks, или None."""
+        if self.track_list:
+            if not 0 <= original_index < len(self._sorted_rank) or self._sorted_rank[original_index] < 0: return None
+            return self.track_list.row_for(self._sorted_rank[original_index])
+        return self._grouped_rows.get(original_index)
+
+    def _highlight_colors(self):
         colors = self.controller.THEMES[self.controller.theme_name]
         is_dark = colors.get("bg", "#000000") < "#888888"
-        playing_index = self.controller.current_track_index
-        
-        for item in self.track_widgets:
-            if item.get('is_banner', False): continue
-            
-            idx = item['original_index']
-            widget = item['widget']
-            if not widget.winfo_exists(): continue
+        return colors, _adjust_color_brightness(colors['frame_secondary'], 1.2 if is_dark else 0.95)
 
-            is_playing = idx == playing_index
-            is_selected = idx in self.selected_indices
-            
-            fg_color = 'transparent'
-            if is_playing: fg_color = colors['accent']
-            elif is_selected: fg_color = _adjust_color_brightness(colors['frame_secondary'], 1.2 if is_dark else 0.95)
-            widget.configure(fg_color=fg_color)
-            
-            title_color = colors['text_on_accent'] if is_playing else colors['text_bright']
-            text_color = colors['text_on_accent'] if is_playing else colors['text_dim']
-
-            # Обновляем цвета текста для всех дочерних виджетов
-            for child in widget.winfo_children():
-                # Находим фрейм с названием и артистом (самый надежный способ - по наличию 2х лейблов)
-                if isinstance(child, ctk.CTkFrame) and len(child.winfo_children()) > 1 and isinstance(child.winfo_children()[1], ctk.CTkFrame):
-                    info_container = child.winfo_children()[1]
-                    if len(info_container.winfo_children()) >= 2:
-                        title_widget = info_container.winfo_children()[0]
-                        artist_widget = info_container.winfo_children()[1]
-                        title_widget.configure(text_color=title_color)
-                        artist_widget.configure(text_color=text_color)
-                elif isinstance(child, ctk.CTkLabel):
-                     child.configure(text_color=text_color)
+    def _apply_row_highlight(self, row, colors, selected_color):
+        idx = row.original_index
+        is_playing = idx == self.controller.current_track_index
+        is_selected = idx in self.selected_indices
+        if row.highlight_state == (is_playing, is_selected): return
+        row.highlight_state = (is_playing, is_selected)
+
+        fg_color = 'transparent'
+        if is_playing: fg_color = colors['accent']
+        elif is_selected: fg_color = selected_color
+        row.configure(fg_color=fg_color)
+
+        title_color = colors['text_on_accent'] if is_playing else colors['text_bright']
+        text_color = colors['text_on_accent'] if is_playing else colors['text_dim']
+        row.title_label.configure(text_color=title_color)
+        for label in row.dim_labels: label.configure(text_color=text_color)
+
+    def update_active_track_highlight(self):
+        """Перекрашивает только строки, чьё состояние (играет / выделена) изменилось с прошлого вызова."""
+        if not self.winfo_exists(): return
+        playing, selection = self.controller.current_track_index, set(self.selected_indices)
+        changed = (selection ^ self._painted_selection) | {playing, self._painted_playing}
+        self._painted_playing, self._painted_selection = playing, selection
+        colors, selected_color = self._highlight_colors()
+        for index in changed:
+            row = self._row_for(index)
+            if row is not None and row.winfo_exists(): self._apply_row_highlight(row, colors, selected_color)
 
     def _get_cached_image(self, path, size=(48, 48)):
-        if not path or not os.path.exists(path): return self.placeholder_img
+        if not path: return self.placeholder_img
         
-        cache_key = f"{path}_{size[0]}"
-        if cache_key in self.image_cache: return self.image_cache[cache_key]
+        cache_key = (path, tuple(size), "cover")
+        ctk_img = image_cache.get(cache_key)
+        if ctk_img is not MISSING: return ctk_img or self.placeholder_img
         
-        try:
-            img = Image.open(path)
-            # --- ИСПРАВЛЕНИЕ: Гарантируем RGBA для совместимости с alpha_composite ---
-            ctk_img = ctk.CTkImage(light_image=img.convert("RGBA"), size=size)
-            self.image_cache[cache_key] = ctk_img
-            return ctk_img
-        except Exception:
-            return self.placeholder_img
+        # Миниатюра уже в пикселях экрана (с учётом масштаба CTk), исходник целиком в памяти не держим
+        scale = self._get_widget_scaling()
+        img = thumbnails.load_thumbnail(path, (round(size[0] * scale), round(size[1] * scale)))
+        ctk_img = ctk.CTkImage(light_image=img, size=size) if img else None
+        image_cache.put(cache_key, ctk_img, image_nbytes(img))
+        return ctk_img or self.placeholder_img
+
+    def _set_row_cover(self, row_frame, path, size=(48, 48)):
+        """Обложка строки: из кеша сразу, иначе заглушка, а картинка подставится, когда её декодирует фоновый пул."""
+        cache_key = (path, tuple(size), "cover")
+        cached = image_cache.get(cache_key) if path else None
+        if cached is not MISSING:
+            self.cover_loader.cancel(row_frame)
+            row_frame.cover_label.configure(image=cached or self.placeholder_img)
+            return
+        row_frame.cover_label.configure(image=self.placeholder_img)
+
+        def on_loaded(img):
+            # Нечитаемую обложку тоже запоминаем (как None), чтобы не декодировать её при каждой прокрутке
+            ctk_img = ctk.CTkImage(light_image=img, size=size) if img else None
+            image_cache.put(cache_key, ctk_img, image_nbytes(img))
+            if row_frame.winfo_exists(): row_frame.cover_label.configure(image=ctk_img or self.placeholder_img)
+
+        scale = self._get_widget_scaling()
+        self.cover_loader.request(row_frame, path, (round(size[0] * scale), round(size[1] * scale)), on_loaded)
+
+    def _set_banner_background(self, bg_label, path, size):
+        """Размытый фон баннера: из кеша сразу, иначе считается в фоновом пуле (см. thumbnails.load_banner_background)."""
+        cache_key = (path, size, "banner")
+        cached = image_cache.get(cache_key)
+        if cached is not MISSING:
+            if cached: bg_label.configure(image=cached)
+            return
+
+        scale = self._get_widget_scaling()
+        pixel_size = (round(size[0] * scale), round(size[1] * scale))
+
+        def on_loaded(img):
+            ctk_img = ctk.CTkImage(light_image=img, size=size) if img else None
+            # PIL-картинка уменьшена, но PhotoImage у Tk растянута до полного размера баннера
+            nbytes = pixel_size[0] * pixel_size[1] * 4 + img.width * img.height * 4 if img else 0
+            image_cache.put(cache_key, ctk_img, nbytes)
+            if ctk_img and bg_label.winfo_exists(): bg_label.configure(image=ctk_img)
+
+        self.cover_loader.request(bg_label, path, pixel_size, on_loaded, loader=thumbnails.load_banner_background)
 
     def _truncate_text(self, text, font, max_width):
-        if not isinstance(text, str): text = str(text)
-        if font.measure(text) <= max_width: return text, None
-        original_text = text
-        while font.measure(text + "...") > max_width and len(text) > 0: text = text[:-1]
-        return text + "...", original_text
+        return truncate_text(text, font, max_width)
 
-    def _create_album_banner_widget(self, parent, track_data, album_tracks):
+    def _create_album_banner_widget(self, parent, track_data, album_indices):
         colors = self.controller.THEMES[self.controller.theme_name]
         banner = ctk.CTkFrame(parent, fg_color="transparent", height=120, corner_radius=8)
         banner.grid_columnconfigure(1, weight=1)
 
-        try:
-            w, h = (parent.winfo_width() or 800, 120)
-            cover_img_bg = self._get_cached_image(track_data.get('cover_path'), size=(w,h))
-            if cover_img_bg and hasattr(cover_img_bg, '_light_image'):
-                bg_label = ctk.CTkLabel(banner, text=""); bg_label.place(x=0, y=0, relwidth=1, relheight=1)
-                source_img = cover_img_bg._light_image.resize((w,h), Image.Resampling.LANCZOS).filter(ImageFilter.GaussianBlur(7))
-                enhancer = ImageEnhance.Brightness(source_img); source_img = enhancer.enhance(0.5)
-                final_bg = ctk.CTkImage(light_image=source_img, size=(w,h))
-                bg_label.configure(image=final_bg)
-            else:
-                 banner.configure(fg_color=_adjust_color_brightness(colors['frame'], 0.8))
-        except Exception as e:
-            print(f"Не удалось создать фон для баннера: {e}")
-            banner.configure(fg_color=_adjust_color_brightness(colors['frame'], 0.8))
+        # Пока фон не готов (или обложки нет), баннер просто затемнён
+        banner.configure(fg_color=_adjust_color_brightness(colors['frame'], 0.8))
+        bg_label = None
+        if track_data.get('cover_path'):
+            width = parent.winfo_width()
+            bucket_width = -(-max(width, 800) // self.BANNER_WIDTH_BUCKET) * self.BANNER_WIDTH_BUCKET
+            bg_label = ctk.CTkLabel(banner, text=""); bg_label.place(x=0, y=0, relwidth=1, relheight=1)
+            self._set_banner_background(bg_label, track_data['cover_path'], (bucket_width, 120))
 
         def on_banner_click(event):
-            self.clear_selection(); all_tracks = self.controller.playlist_data[self.controller.current_category]
-            for track in album_tracks:
-                try: self.add_to_selection(all_tracks.index(track))
-                except ValueError: continue
+            self.clear_selection()
+            for original_index in album_indices: self.add_to_selection(original_index)
             self.update_active_track_highlight()
 
         banner.bind("<Button-1>", on_banner_click)
-        if 'bg_label' in locals(): bg_label.bind("<Button-1>", on_banner_click)
+        if bg_label: bg_label.bind("<Button-1>", on_banner_click)
 
         cover_img_fg = self._get_cached_image(track_data.get('cover_path'), size=(100, 100))
         cover_label = ctk.CTkLabel(banner, text="", image=cover_img_fg, corner_radius=6, fg_color=_adjust_color_brightness(colors['frame'], 0.5)); cover_label.grid(row=0, column=0, rowspan=2, padx=10, pady=10)
@@ -574,8 +779,17 @@ class ContentFrame(ctk.CTkFrame):
         
 
     def _create_track_widget(self, parent, track_data, original_index, display_index=None):
+        row_frame = self._create_track_row(parent)
+        self._bind_track_row(row_frame, track_data, original_index, display_index)
+        return row_frame
+
+    def _create_track_row(self, parent):
+        """Создаёт пустую строку трека. Данные в неё подставляет _bind_track_row, поэтому строку можно переиспользовать."""
         colors = self.controller.THEMES[self.controller.theme_name]
         row_frame = ctk.CTkFrame(parent, fg_color="transparent", height=56)
+        row_frame.grid_propagate(False)
+        row_frame.original_index = None
+        row_frame.highlight_state = (False, False) # (играет, выделена) — так строка выглядит после создания
         
         row_frame.grid_columnconfigure(0, weight=4, uniform="group1")
         row_frame.grid_columnconfigure(1, weight=50, uniform="group1")
@@ -583,61 +797,73 @@ class ContentFrame(ctk.CTkFrame):
         row_frame.grid_columnconfigure(3, weight=20, uniform="group1")
         row_frame.grid_columnconfigure(4, weight=8, uniform="group1")
         row_frame.grid_columnconfigure(5, weight=10, uniform="group1") 
+        row_frame.grid_rowconfigure(0, weight=1)
 
-        idx_text = str(display_index) if display_index is not None else '•'
-        index_label = ctk.CTkLabel(row_frame, text=idx_text, font=self.fonts['artist'], text_color=colors['text_dim'])
+        index_label = ctk.CTkLabel(row_frame, text="", font=self.fonts['artist'], text_color=colors['text_dim'])
         index_label.grid(row=0, column=0, rowspan=2, sticky="ew")
 
         cover_container = ctk.CTkFrame(row_frame, fg_color="transparent")
         cover_container.grid(row=0, column=1, rowspan=2, sticky="w", padx=10)
-        cover_img = self._get_cached_image(track_data.get('cover_path'))
-        cover_label = ctk.CTkLabel(cover_container, text="", image=cover_img, width=48); cover_label.pack(side="left")
+        cover_label = ctk.CTkLabel(cover_container, text="", image=self.placeholder_img, width=48); cover_label.pack(side="left")
         
         info_frame = ctk.CTkFrame(cover_container, fg_color="transparent")
         info_frame.pack(side="left", fill="x", expand=True, padx=10)
         
-        truncated_title, full_title = self._truncate_text(track_data.get('name', ''), self.fonts['track_title'], 250)
-        title_label = ctk.CTkLabel(info_frame, text=truncated_title, font=self.fonts['track_title'], text_color=colors['text_bright'], anchor="w")
+        title_label = ctk.CTkLabel(info_frame, text="", font=self.fonts['track_title'], text_color=colors['text_bright'], anchor="w")
         title_label.pack(anchor="w", fill="x")
-        if full_title: Tooltip(title_label, full_title)
-        
-        truncated_artist, full_artist = self._truncate_text(track_data.get('artist', ''), self.fonts['artist'], 250)
-        artist_label = ctk.CTkLabel(info_frame, text=truncated_artist, font=self.fonts['artist'], text_color=colors['text_dim'], anchor="w")
+        artist_label = ctk.CTkLabel(info_frame, text="", font=self.fonts['artist'], text_color=colors['text_dim'], anchor="w")
         artist_label.pack(anchor="w", fill="x")
-        if full_artist: Tooltip(artist_label, full_artist)
 
-        truncated_album, full_album = self._truncate_text(track_data.get('album', ''), self.fonts['artist'], 180)
-        album_label = ctk.CTkLabel(row_frame, text=truncated_album, text_color=colors['text_dim'], font=self.fonts['artist'], anchor="w")
+        album_label = ctk.CTkLabel(row_frame, text="", text_color=colors['text_dim'], font=self.fonts['artist'], anchor="w")
         album_label.grid(row=0, column=2, rowspan=2, sticky="w", padx=10)
-        if full_album: Tooltip(album_label, full_album)
-        
-        key = self.dynamic_column_key
-        if key == 'date_added': dynamic_text = datetime.datetime.fromtimestamp(track_data.get(key, 0)).strftime('%d %b %Y')
-        else: dynamic_text = str(track_data.get(key, ''))
-        truncated_dynamic, full_dynamic = self._truncate_text(dynamic_text, self.fonts['artist'], 120)
-        dynamic_label = ctk.CTkLabel(row_frame, text=truncated_dynamic, text_color=colors['text_dim'], font=self.fonts['artist'], anchor="w")
+        dynamic_label = ctk.CTkLabel(row_frame, text="", text_color=colors['text_dim'], font=self.fonts['artist'], anchor="w")
         dynamic_label.grid(row=0, column=3, rowspan=2, sticky="w", padx=10)
-        if full_dynamic: Tooltip(dynamic_label, full_dynamic)
-
-        duration_str = time.strftime('%M:%S', time.gmtime(track_data.get('duration', 0)))
-        ctk.CTkLabel(row_frame, text=duration_str, text_color=colors['text_dim'], font=self.fonts['artist']).grid(row=0, column=4, rowspan=2, padx=10, sticky="ew")
+        duration_label = ctk.CTkLabel(row_frame, text="", text_color=colors['text_dim'], font=self.fonts['artist'])
+        duration_label.grid(row=0, column=4, rowspan=2, padx=10, sticky="ew")
+
+        row_frame.index_label, row_frame.cover_label, row_frame.title_label = index_label, cover_label, title_label
+        row_frame.artist_label, row_frame.album_label, row_frame.dynamic_label, row_frame.duration_label = artist_label, album_label, dynamic_label, duration_label
+        row_frame.dim_labels = (index_label, artist_label, album_label, dynamic_label, duration_label)
+        # Подсказки с полным текстом; текст подставляется при привязке строки
+        row_frame.tooltips = {label: Tooltip(label, None) for label in (title_label, artist_label, album_label, dynamic_label)}
         
         is_dark = colors.get("bg", "#000000") < "#888888"
         hover_color = _adjust_color_brightness(colors['frame_secondary'], 1.1 if is_dark else 0.95)
+        def is_plain():
+            i = row_frame.original_index
+            return i is not None and i not in self.selected_indices and i != self.controller.current_track_index
         def on_enter(e):
-            if original_index not in self.selected_indices and original_index != self.controller.current_track_index: row_frame.configure(fg_color=hover_color)
+            if is_plain(): row_frame.configure(fg_color=hover_color)
         def on_leave(e):
-            if original_index not in self.selected_indices and original_index != self.controller.current_track_index: row_frame.configure(fg_color='transparent')
+            if is_plain(): row_frame.configure(fg_color='transparent')
         
         all_widgets_in_row = [row_frame, index_label, title_label, artist_label, album_label, dynamic_label, cover_container, cover_label, info_frame]
         for widget in all_widgets_in_row:
             widget.bind("<Enter>", on_enter)
             widget.bind("<Leave>", on_leave)
-            widget.bind("<Button-1>", lambda e, i=original_index: self._on_track_click(e, i))
-            widget.bind("<Double-Button-1>", lambda e, i=original_index: self.controller.select_and_play(i))
-            widget.bind("<Button-3>", lambda e, i=original_index: self._show_context_menu(e, i))
+            widget.bind("<Button-1>", lambda e: self._on_track_click(e, row_frame.original_index))
+            widget.bind("<Double-Button-1>", lambda e: self.controller.select_and_play(row_frame.original_index))
+            widget.bind("<Button-3>", lambda e: self._show_context_menu(e, row_frame.original_index))
             
         return row_frame
+
+    def _bind_track_row(self, row_frame, track_data, original_index, display_index=None):
+        row_frame.original_index = original_index
+        row_frame.index_label.configure(text=str(display_index) if display_index is not None else '•')
+        self._set_row_cover(row_frame, track_data.get('cover_path'))
+
+        key = self.dynamic_column_key
+        if key == 'date_added': dynamic_text = datetime.datetime.fromtimestamp(track_data.get(key, 0)).strftime('%d %b %Y')
+        else: dynamic_text = str(track_data.get(key, ''))
+        for label, text, font, max_width in ((row_frame.title_label, track_data.get('name', ''), self.fonts['track_title'], 250),
+                                             (row_frame.artist_label, track_data.get('artist', ''), self.fonts['artist'], 250),
+                                             (row_frame.album_label, track_data.get('album', ''), self.fonts['artist'], 180),
+                                             (row_frame.dynamic_label, dynamic_text, self.fonts['artist'], 120)):
+            truncated, full = self._truncate_text(text, font, max_width)
+            label.configure(text=truncated)
+            row_frame.tooltips[label].text = full
+
+        row_frame.duration_label.configure(text=time.strftime('%M:%S', time.gmtime(track_data.get('duration', 0))))
     
     # В классе ContentFrame, в конце файла:
 
@@ -672,8 +898,21 @@ class ContentFrame(ctk.CTkFrame):
         self.search_status_label = ctk.CTkLabel(self, text="", text_color=colors["text_dim"])
         self.search_status_label.pack(fill="x", padx=20, pady=5)
 
+        # Панель очереди загрузок (внизу, под результатами)
+        self.download_panel = ctk.CTkFrame(self, fg_color=colors["frame"])
+        self.download_panel.pack(side="bottom", fill="x", padx=20, pady=(0, 20))
+        self.download_panel.grid_columnconfigure(0, weight=1)
+        ctk.CTkLabel(self.download_panel, text="Загрузки", font=self.fonts['column_header'], text_color=colors["text"], anchor="w").grid(row=0, column=0, sticky="w", padx=10, pady=(5, 0))
+        ctk.CTkButton(self.download_panel, text="Очистить завершённые", height=24, fg_color="transparent", border_width=1, text_color=colors["text_dim"], hover_color=colors["frame_secondary"],
+                      command=self.controller.download_manager.clear_finished).grid(row=0, column=1, padx=10, pady=(5, 0))
+        self.download_list = ctk.CTkScrollableFrame(self.download_panel, fg_color="transparent", height=120)
+        self.download_list.grid(row=1, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
+        self.download_list.grid_columnconfigure(0, weight=1)
+        self._download_rows, self._download_buttons, self._download_panel_version = {}, {}, None
+        self.update_download_panel(self.controller.download_manager)
+
         self.search_results_frame = ctk.CTkScrollableFrame(self, fg_color=colors["frame"])
-        self.search_results_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+        self.search_results_frame.pack(fill="both", expand=True, padx=20, pady=(0, 10))
 
     def display_search_results(self):
         self.search_status_label.configure(text=f"Найдено: {len(self.controller.search_results_cache)} треков.")
@@ -684,6 +923,18 @@ class ContentFrame(ctk.CTkFrame):
         for i, track_data in enumerate(self.controller.search_results_cache):
             self.create_result_widget(self.search_results_frame, track_data, i)
 
+    def append_search_results(self, results):
+        """Дописывает результаты очередного источника под уже показанными, не перерисовывая их."""
+        if not self.search_results_frame or not self.search_results_frame.winfo_exists(): return
+        start = len(self.search_results_frame.winfo_children())
+        for i, track_data in enumerate(results, start):
+            self.create_result_widget(self.search_results_frame, track_data, i)
+
+    def update_search_status(self, text, searching):
+        if not self.search_status_label or not self.search_status_label.winfo_exists(): return
+        self.search_status_label.configure(text=text)
+        self.search_button.configure(state="disabled" if searching else "normal")
+
     def create_result_widget(self, parent, data, row):
         colors = self.controller.THEMES[self.controller.theme_name]
 
@@ -695,10 +946,18 @@ class ContentFrame(ctk.CTkFrame):
 
         thumbnail_url = data.get('thumbnail')
         if thumbnail_url:
-            def update_image(img):
-                if img and cover_label.winfo_exists():
-                    cover_label.configure(image=img)
-            search.start_image_load_thread(thumbnail_url, (64, 64), update_image)
+            # Обложки результатов качаются общим пулом с дедупликацией; у удалённой строки загрузка отменяется
+            cache_key = (thumbnail_url, (64, 64), "web")
+            cached = image_cache.get(cache_key)
+            if cached is not MISSING:
+                if cached: cover_label.configure(image=cached)
+            else:
+                def update_image(img):
+                    ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(64, 64)) if img else None
+                    if img: image_cache.put(cache_key, ctk_img, image_nbytes(img))
+                    if ctk_img and cover_label.winfo_exists(): cover_label.configure(image=ctk_img)
+                self.cover_loader.request(cover_label, thumbnail_url, (64, 64), update_image, loader=web_thumbnails.load_url_thumbnail)
+                cover_label.bind("<Destroy>", lambda e: self.cover_loader.cancel(cover_label), add="+")
 
         info_frame = ctk.CTkFrame(widget_frame, fg_color="transparent")
         info_frame.pack(side="left", fill="x", expand=True)
@@ -711,8 +970,71 @@ class ContentFrame(ctk.CTkFrame):
 
         # --- ИЗМЕНЕНИЕ: Кнопка предпрослушивания и её логика полностью удалены ---
         download_btn = ctk.CTkButton(buttons_frame, text="⏬", width=40, 
-                                     command=lambda: search.start_download_thread(self.controller, data, download_btn))
+                                     command=lambda: (search.start_download(self.controller, data), self.update_download_panel(self.controller.download_manager)))
         download_btn.pack(side="left", padx=5)
+        if data.get('url'): self._download_buttons[data['url']] = download_btn
+        self._download_panel_version = None # состояние новой кнопки берётся из очереди при следующем обновлении
+
+    def update_download_panel(self, manager):
+        """Приводит панель загрузок к состоянию очереди; пока очередь не менялась, ничего не делает."""
+        if not self.download_panel or not self.download_panel.winfo_exists(): return
+        if manager.version == self._download_panel_version: return
+        self._download_panel_version = manager.version
+        colors = self.controller.THEMES[self.controller.theme_name]
+        items = manager.snapshot()
+
+        for item_id in set(self._download_rows) - {item['id'] for item in items}:
+            self._download_rows.pop(item_id)['frame'].destroy()
+        for row_index, item in enumerate(items):
+            row = self._download_rows.get(item['id'])
+            if row is None: row = self._download_rows[item['id']] = self._create_download_row(item, colors)
+            row['frame'].grid(row=row_index, column=0, sticky="ew", pady=2)
+            self._bind_download_row(row, item, manager)
+
+        # Кнопки скачивания у результатов поиска отражают состояние их загрузки
+        states = {item['url']: item['status'] for item in items}
+        for url, button in list(self._download_buttons.items()):
+            if not button.winfo_exists():
+                del self._download_buttons[url]; continue
+            status = states.get(url)
+            if status in ("queued", "downloading"): button.configure(text="...", state="disabled")
+            elif status == "done": button.configure(text="✓", state="disabled")
+            elif status == "failed": button.configure(text="X", state="normal")
+            else: button.configure(text="⏬", state="normal")
+
+    def _create_download_row(self, item, colors):
+        frame = ctk.CTkFrame(self.download_list, fg_color="transparent")
+        frame.grid_columnconfigure(0, weight=1)
+        title, _ = self._truncate_text(item['title'], self.fonts['artist'], 300)
+        ctk.CTkLabel(frame, text=title, font=self.fonts['artist'], text_color=colors["text"], anchor="w").grid(row=0, column=0, sticky="w", padx=5)
+        status_label = ctk.CTkLabel(frame, text="", font=self.fonts['artist'], text_color=colors["text_dim"], anchor="e")
+        status_label.grid(row=0, column=1, sticky="e", padx=5)
+        action_button = ctk.CTkButton(frame, text="", width=28, height=22, fg_color="transparent", border_width=1, text_color=colors["text_dim"], hover_color=colors["frame_secondary"])
+        action_button.grid(row=0, column=2, padx=5)
+        progress_bar = ctk.CTkProgressBar(frame, height=6, progress_color=colors["accent"])
+        progress_bar.grid(row=1, column=0, columnspan=3, sticky="ew", padx=5, pady=(0, 2))
+        return {'frame': frame, 'status_label': status_label, 'action_button': action_button, 'progress_bar': progress_bar, 'state': None, 'tooltip': Tooltip(status_label, None)}
+
+    def _bind_download_row(self, row, item, manager):
+        status = item['status']
+        done, total, speed = item.get('downloaded_bytes') or 0, item.get('total_bytes'), item.get('speed')
+        if status == "downloading":
+            text = f"{done / 1048576:.1f}" + (f" из {total / 1048576:.1f} МБ" if total else " МБ") + (f", {speed / 1024:.0f} КБ/с" if speed else "")
+        elif status == "queued":
+            text = f"Ждёт повтора (попытка {item['attempts'] + 1})" if item['attempts'] else "В очереди"
+        elif status == "done": text = "Готово"
+        elif status == "failed": text = "Ошибка"
+        else: text = "Отменено"
+        row['status_label'].configure(text=text)
+        if status in ("downloading", "done") and (total or status == "done"): row['progress_bar'].set(1.0 if status == "done" else min(1.0, done / total))
+        elif row['state'] != status: row['progress_bar'].set(0)
+        if row['state'] != status:
+            # Кнопка меняется только вместе со статусом
+            row['state'] = status
+            if status in ("queued", "downloading"): row['action_button'].configure(text="✕", command=partial(manager.cancel, item['id'])); row['action_button'].grid()
+            elif status in ("failed", "cancelled"): row['action_button'].configure(text="↻", command=partial(manager.retry, item['id'])); row['action_button'].grid()
+            else: row['action_button'].grid_remove()
+            row['tooltip'].text = (item.get('error') or "")[:300] or None
 
     def display_themes_view(self):
         self._clear_view()
@@ -845,11 +1167,14 @@ class PlayerControlFrame(ctk.CTkFrame):
         display_text = f"{track_info.get('name', '')}\nРейтинг: {score} | Прослушано: {play_count}"
         self.now_playing_label.configure(text=display_text)
         cover_path = track_info.get('cover_path')
-        if cover_path and os.path.exists(cover_path):
-            try:
-                pil_image = Image.open(cover_path); ctk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(64, 64)); self.now_playing_cover.configure(image=ctk_image)
-            except Exception as e: print(f"Ошибка загрузки локальной обложки: {e}"); self.now_playing_cover.configure(image=self.placeholder_image)
-        else: self.now_playing_cover.configure(image=self.placeholder_image)
+        cache_key = (cover_path, (64, 64), "cover")
+        ctk_image = image_cache.get(cache_key) if cover_path else None
+        if ctk_image is MISSING:
+            scale = self._get_widget_scaling()
+            pil_image = thumbnails.load_thumbnail(cover_path, (round(64 * scale), round(64 * scale)))
+            ctk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(64, 64)) if pil_image else None
+            image_cache.put(cache_key, ctk_image, image_nbytes(pil_image))
+        self.now_playing_cover.configure(image=ctk_image or self.placeholder_image)
 
     def clear_track_info(self): self.now_playing_label.configure(text="Выберите трек"); self.now_playing_cover.configure(image=self.placeholder_image); self.update_fav_button_status()
     def update_play_pause_button(self, is_playing): self.play_pause_button.configure(text="⏸" if is_playing and not self.controller.is_paused else "▶")
@@ -873,9 +1198,8 @@ class PlayerControlFrame(ctk.CTkFrame):
         if self.controller.current_track_index == -1: self.fav_button.configure(text="♡", state="disabled"); return
         self.fav_button.configure(state="normal")
         try:
-            track_info = self.controller.playlist_data[self.controller.current_category][self.controller.current_track_index]
-            fav_list = self.controller.playlist_data.get(FAVORITES_NAME, [])
-            is_fav = any(t['path'] == track_info['path'] for t in fav_list)
+            track_id = self.controller.playlist_data[self.controller.current_category][self.controller.current_track_index]
+            is_fav = self.controller.library.contains(FAVORITES_NAME, track_id)
             colors = self.theme_colors
             if is_fav: self.fav_button.configure(text="❤", text_color=colors["accent"])
             else: self.fav_button.configure(text="♡", text_color=colors["text_dim"])
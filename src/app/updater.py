@@ -4,12 +4,15 @@ import sys
 import os
 import subprocess
 import json
+import threading
 from tkinter import messagebox
 from packaging import version
 
 VERSION_URL = "https://raw.githubusercontent.com/kutuleek0/RaZ-Music-player-With-love-from-kutuleek/main/version.json"
 
-def check_for_updates(current_version_str):
+def check_for_updates(current_version_str, dispatcher, close_app):
+    """Выполняется в фоновом потоке. Диалоги показываются в потоке Tk через dispatcher (ui_dispatch.UIDispatcher);
+    close_app() закрывает программу, чтобы установщик мог заменить exe."""
     try:
         response = requests.get(VERSION_URL, timeout=5)
         response.raise_for_status()
@@ -39,8 +42,7 @@ def check_for_updates(current_version_str):
                        f"{changelog_text}\n\n"
                        f"Хотите обновиться сейчас?")
             
-            if messagebox.askyesno("Доступно обновление", message):
-                download_and_install(download_url)
+            dispatcher.post_idle(_ask_to_update, message, download_url, dispatcher, close_app)
         else:
             print("У вас последняя версия программы.")
 
@@ -49,12 +51,16 @@ def check_for_updates(current_version_str):
     except Exception as e:
         print(f"Произошла непредвиденная ошибка при проверке обновлений: {e}")
 
-def download_and_install(url):
-    # (Этот метод остается без изменений)
+def _ask_to_update(message, download_url, dispatcher, close_app):
+    # Поток Tk, вне разбора очереди dispatcher: модальный диалог не задерживает остальные обновления
+    if not messagebox.askyesno("Доступно обновление", message): return
+    messagebox.showinfo("Загрузка обновления", "Начинается загрузка обновления. Приложение закроется и перезапустится автоматически.")
+    threading.Thread(target=download_and_install, args=(download_url, dispatcher, close_app), daemon=True).start()
+
+def download_and_install(url, dispatcher, close_app):
+    current_exe = os.path.basename(sys.executable)
+    new_exe_temp_name = f"{current_exe}.new"
     try:
-        current_exe = os.path.basename(sys.executable)
-        new_exe_temp_name = f"{current_exe}.new"
-        messagebox.showinfo("Загрузка обновления", "Начинается загрузка обновления. Приложение закроется и перезапустится автоматически.")
         response = requests.get(url, stream=True)
         response.raise_for_status()
         with open(new_exe_temp_name, "wb") as f:
@@ -63,7 +69,8 @@ def download_and_install(url):
         script_path = "update_installer.bat"
         with open(script_path, "w", encoding="cp866") as f: f.write(script_content)
         subprocess.Popen([script_path])
-        sys.exit(0)
+        # sys.exit() здесь завершил бы только этот поток; программу закрывает поток Tk
+        dispatcher.post(close_app)
     except Exception as e:
-        messagebox.showerror("Ошибка обновления", f"Не удалось завершить обновление: {e}")
+        dispatcher.post_idle(messagebox.showerror, "Ошибка обновления", f"Не удалось завершить обновление: {e}")
         if os.path.exists(new_exe_temp_name): os.remove(new_exe_temp_name)
\ No newline at end of file
@@ -0,0 +1,96 @@
+# app/web_thumbnails.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+from .thumbnails import THUMB_DIR
+
+WEB_THUMB_DIR = os.path.join(THUMB_DIR, "web")
+os.makedirs(WEB_THUMB_DIR, exist_ok=True)
+
+REQUEST_TIMEOUT = (5, 15) # (соединение, чтение), секунд
+DEFAULT_MAX_AGE = 24 * 3600 # если сервер не указал Cache-Control: max-age
+POOL_SIZE = 8
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Общая сессия: соединения (и TLS) с i.ytimg.com и другими хостами переиспользуются между запросами."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=1)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _cache_paths(url):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(WEB_THUMB_DIR, digest + ".img"), os.path.join(WEB_THUMB_DIR, digest + ".json")
+
+
+def _expires(response):
+    cache_control = response.headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control: return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return time.time() + (int(match.group(1)) if match else DEFAULT_MAX_AGE)
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f: f.write(data)
+    os.replace(tmp_path, path)
+
+
+def fetch(url):
+    """Байты картинки по url через дисковый HTTP-кеш.
+
+    Пока запись свежа (Cache-Control: max-age), сеть не трогается. Устаревшая
+    запись перепроверяется условным запросом (If-None-Match / If-Modified-Since):
+    ответ 304 продлевает её без повторного скачивания.
+    """
+    data_path, meta_path = _cache_paths(url)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f: meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        meta = {}
+    cached = os.path.exists(data_path)
+    if cached and meta.get('expires', 0) > time.time():
+        with open(data_path, 'rb') as f: return f.read()
+
+    headers = {}
+    if cached and meta.get('etag'): headers['If-None-Match'] = meta['etag']
+    if cached and meta.get('last_modified'): headers['If-Modified-Since'] = meta['last_modified']
+    response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304 and cached:
+        meta['expires'] = _expires(response)
+        _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        with open(data_path, 'rb') as f: return f.read()
+    response.raise_for_status()
+    data = response.content
+    _write_atomic(data_path, data)
+    meta = {'etag': response.headers.get("ETag"), 'last_modified': response.headers.get("Last-Modified"), 'expires': _expires(response)}
+    _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+    return data
+
+
+def load_url_thumbnail(url, size):
+    """Загрузчик для CoverLoader: RGBA-картинка size пикселей по url или None."""
+    try:
+        with Image.open(BytesIO(fetch(url))) as source:
+            return source.convert("RGBA").resize(size, Image.Resampling.LANCZOS)
+    except Exception as e:
+        print(f"Ошибка загрузки обложки: {e}")
+        return None
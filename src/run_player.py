@@ -1,9 +1,12 @@
 import sys
+import multiprocessing
 from tkinterdnd2 import DND_FILES, TkinterDnD
 
 from app.main_window import RaZPlayer
 
 if __name__ == "__main__":
+    # Нужно для пула процессов импорта в собранном .exe
+    multiprocessing.freeze_support()
     try:
         # --- ИЗМЕНЕНИЕ АРХИТЕКТУРЫ ---
         # 1. Создаем корневое окно, поддерживающее Drag-and-Drop